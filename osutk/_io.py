@@ -0,0 +1,23 @@
+__author__ = 'Agka'
+
+# How many lines are joined together before handing them to the output stream.
+WRITE_BATCH_LINES = 4096
+
+
+def write_lines(file_output, lines):
+    """
+    Write lines to a text stream, each followed by a newline.
+     :param file_output: The stream.
+     :param lines: An iterable of lines, without their terminators.
+    """
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == WRITE_BATCH_LINES:
+            batch.append("")
+            file_output.write("\n".join(batch))
+            batch = []
+
+    if batch:
+        batch.append("")
+        file_output.write("\n".join(batch))
@@ -3,3 +3,6 @@ __author__ = 'Agka'
 from .timing_point import TimingPoint
 from .sampleset import SampleSet
 from .hitobject import HitObject, Slider, HitCircle, Hold, Spinner
+from .hitobject_table import HitObjectTable, HitObjectView
+from .timing_point_table import TimingPointTable, TimingPointView, SampleSetView
+from .storyboard_sample_table import StoryboardSampleTable
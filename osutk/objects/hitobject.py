@@ -1,3 +1,5 @@
+from sys import intern
+
 __author__ = 'Agka'
 
 
@@ -30,6 +32,9 @@ class HitObject(object):
     # 4, 8, 16, 32, 64 = New Combo as well. (from aibat)
     COMBO_MASK = 4 | 8 | 16 | 32 | 64
 
+    __slots__ = ("x", "y", "time", "hitsound", "sample_set", "addition_set", "custom_set", "volume",
+                 "custom_sample", "type")
+
     def __init__(self, x, y, time, hitsound):
         self.x = x
         """
@@ -102,7 +107,7 @@ class HitObject(object):
         self.addition_set = add_dt[1] if len(add_dt) > 1 else 0
         self.custom_set = add_dt[2] if len(add_dt) > 2 else 0
         self.volume = add_dt[3] if len(add_dt) > 3 else 0
-        self.custom_sample = add_dt[4] if len(add_dt) > 4 else ""
+        self.custom_sample = intern_sample(add_dt[4]) if len(add_dt) > 4 else ""
 
     def get_additive_str(self):
         """
@@ -138,6 +143,70 @@ class HitObject(object):
         :return: A derivative class of HitObject from this string.
         """
         entries = string.split(",")
+        try:
+            ret = HitObject._from_entries_fast(entries)
+        except (IndexError, ValueError):
+            ret = None
+
+        if ret is None:
+            ret = HitObject._from_entries(string, entries)
+        return ret
+
+    @staticmethod
+    def _from_entries_fast(entries):
+        """
+        Parse a well-formed circle, spinner or hold without going through set_data.
+        :param entries: The comma separated fields of the line.
+        :return: The hitobject, or None if it's a slider or its hitsound data isn't in the usual form.
+        """
+        kind = int(entries[3])
+        if kind & HitObject.CIRCLE:
+            cls = HitCircle
+            additions = entries[5].split(":")
+        elif kind & HitObject.SLIDER:
+            return None
+        elif kind & HitObject.SPINNER:
+            cls = Spinner
+            additions = entries[6].split(":")
+        elif kind & HitObject.HOLD:
+            cls = Hold
+            additions = entries[5].split(":")
+        else:
+            return None
+
+        if cls is Hold:
+            if len(additions) != 6:
+                return None
+            end_time = int(additions[0])
+            sample_set, addition_set, custom_set, volume, custom_sample = additions[1:]
+        elif len(additions) != 5:
+            return None
+        else:
+            sample_set, addition_set, custom_set, volume, custom_sample = additions
+
+        ret = cls.__new__(cls)
+        ret.x = int(entries[0])
+        ret.y = int(entries[1])
+        ret.time = float(int(entries[2]))
+        ret.type = kind
+        ret.hitsound = int(entries[4])
+        ret.sample_set = int(sample_set)
+        ret.addition_set = int(addition_set)
+        ret.custom_set = int(custom_set)
+        ret.volume = int(volume)
+        ret.custom_sample = intern(custom_sample) if custom_sample else ""
+
+        if cls is Hold:
+            ret.end_time = end_time
+        elif cls is Spinner:
+            ret.end_time = entries[5]
+        return ret
+
+    @staticmethod
+    def _from_entries(string, entries):
+        """
+        Tolerant parser for any hitobject line, used for sliders and lines the fast path can't handle.
+        """
         try:
             val = int(entries[3])  # hitobject kind
             info = list(map(int, entries[:5]))  # information applied to all objects
@@ -171,6 +240,13 @@ class HitObject(object):
         self.sample_set = 0
 
 
+def intern_sample(filename):
+    """
+    Intern a custom sample filename, so every object using the same sample shares one string.
+    """
+    return intern(filename) if type(filename) is str else filename
+
+
 def default_int(s):
     try:
         return int(s)
@@ -179,6 +255,8 @@ def default_int(s):
 
 
 class HitCircle(HitObject):
+    __slots__ = ()
+
     def __init__(self, x, y, time, hitsound):
         HitObject.__init__(self, x, y, time, hitsound)
         self.type = HitObject.CIRCLE
@@ -188,6 +266,8 @@ class HitCircle(HitObject):
 
 
 class Slider(HitObject):
+    __slots__ = ("repeat", "points", "curve_type", "pixel_length", "edge_hitsound", "edge_addition")
+
     def __init__(self, x, y, time, hitsound):
         HitObject.__init__(self, x, y, time, hitsound)
         self.repeat = 1
@@ -198,9 +278,9 @@ class Slider(HitObject):
         """
             A list of dictionaries containing the keys 'x' and 'y' containing the point's coordinates.
         """
-        self.type = "P"
+        self.curve_type = "P"
         """
-            The slider type. Follows the .osu representation.
+            The slider curve type. Follows the .osu representation.
         """
         self.pixel_length = 140
         """
@@ -209,10 +289,12 @@ class Slider(HitObject):
         self.edge_hitsound = 0
         """
             The numerical value of the hitsound to play at an edge.
+            If each edge has its own, the raw .osu pipe separated string.
         """
         self.edge_addition = 0
         """
             The numerical value of the additional hitsound to play at an edge.
+            If each edge has its own, the raw .osu pipe separated string.
         """
 
         self.type = HitObject.SLIDER
@@ -225,26 +307,45 @@ class Slider(HitObject):
             self.pixel_length = float(data[7])
 
         if len(data) > 8:
-            self.edge_hitsound = int(data[8])
+            self.edge_hitsound = default_int(data[8])
 
         if len(data) > 9:
-            self.edge_addition = int(data[9])
+            self.edge_addition = default_int(data[9])
 
         if len(data) > 10:
             self.set_addition(list(map(default_int, data[10].split(":"))))
 
         if len(data) > 5:
             point_data = data[5].split("|")
-            self.type = point_data[0]
+            self.curve_type = point_data[0]
             for x in point_data[1:]:
                 point = list(map(default_int, x.split(":")))
                 self.points.append({"x": point[0], "y": point[1]})
 
     def __str__(self):
-        raise NotImplementedError()
+        curve = "|".join([self.curve_type] + ["{}:{}".format(p["x"], p["y"]) for p in self.points])
+        pixel_length = self.pixel_length
+        if pixel_length == int(pixel_length):
+            pixel_length = int(pixel_length)
+
+        s = "{},{},{},{},{},{},{},{}".format(self.x,
+                                             self.y,
+                                             int(self.time),
+                                             self.type,
+                                             self.hitsound,
+                                             curve,
+                                             self.repeat,
+                                             pixel_length)
+
+        additive = self.get_additive_str()
+        if self.edge_hitsound != 0 or self.edge_addition != 0 or additive != "0:0:0:0:":
+            s += ",{},{},{}".format(self.edge_hitsound, self.edge_addition, additive)
+        return s
 
 
 class Spinner(HitObject):
+    __slots__ = ("end_time",)
+
     def __init__(self, x, y, time, hitsound):
         HitObject.__init__(self, x, y, time, hitsound)
         self.end_time = time
@@ -257,8 +358,19 @@ class Spinner(HitObject):
         self.end_time = data[5]
         self.set_addition(list(map(default_int, data[6].split(":"))))
 
+    def __str__(self):
+        return "{},{},{},{},{},{},{}".format(self.x,
+                                             self.y,
+                                             int(self.time),
+                                             self.type,
+                                             self.hitsound,
+                                             self.end_time,
+                                             self.get_additive_str())
+
 
 class Hold(HitObject):
+    __slots__ = ("end_time",)
+
     def __init__(self, x, y, time, hitsound):
         HitObject.__init__(self, x, y, time, hitsound)
         self.end_time = time
@@ -0,0 +1,328 @@
+from array import array
+
+from .hitobject import HitObject, HitCircle, Slider, Spinner, Hold
+
+__author__ = 'Agka'
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class HitObjectView(HitObject):
+    """
+    A row of a HitObjectTable, usable wherever a HitObject is expected.
+    Reading or writing its attributes reads or writes the table columns.
+    """
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        # Deliberately not calling HitObject.__init__: all state lives in the table.
+        self._table = table
+        self._row = row
+
+    def _column(name):
+        def get(self):
+            return getattr(self._table, name)[self._row]
+
+        def set(self, value):
+            getattr(self._table, name)[self._row] = value
+            self._table.modified = True
+
+        return property(get, set)
+
+    x = _column("x")
+    y = _column("y")
+    time = _column("time")
+    type = _column("type")
+    hitsound = _column("hitsound")
+    sample_set = _column("sample_set")
+    addition_set = _column("addition_set")
+    custom_set = _column("custom_set")
+    volume = _column("volume")
+    del _column
+
+    @property
+    def custom_sample(self):
+        return self._table.samples[self._table.custom_sample[self._row]]
+
+    @custom_sample.setter
+    def custom_sample(self, value):
+        self._table.custom_sample[self._row] = self._table.intern_sample(value)
+        self._table.modified = True
+
+    @property
+    def end_time(self):
+        if not self.type & (HitObject.HOLD | HitObject.SPINNER):
+            raise AttributeError("Only holds and spinners have an end time.")
+
+        end_time = self._table.end_time[self._row]
+        return int(end_time) if end_time.is_integer() else end_time
+
+    @end_time.setter
+    def end_time(self, value):
+        self._table.end_time[self._row] = value
+        self._table.modified = True
+
+    @property
+    def duration(self):
+        return self.end_time - self.time
+
+    def _slider_attribute(name, copy=lambda value: value):
+        def get(self):
+            try:
+                return copy(self._table.slider_data[self._row][name])
+            except KeyError:
+                raise AttributeError("Only sliders have a {}.".format(name))
+
+        def set(self, value):
+            self._table.slider_data[self._row][name] = copy(value)
+            self._table.modified = True
+
+        return property(get, set)
+
+    repeat = _slider_attribute("repeat")
+    # A copy, so the table can't be changed in place without noticing: assign the edited list back.
+    points = _slider_attribute("points", lambda points: [dict(point) for point in points])
+    curve_type = _slider_attribute("curve_type")
+    pixel_length = _slider_attribute("pixel_length")
+    edge_hitsound = _slider_attribute("edge_hitsound")
+    edge_addition = _slider_attribute("edge_addition")
+    del _slider_attribute
+
+    def get_additive_str(self):
+        if self.type & HitObject.HOLD:
+            return "{}:".format(self.end_time) + HitObject.get_additive_str(self)
+        return HitObject.get_additive_str(self)
+
+    def __str__(self):
+        if not self.type & HitObject.CIRCLE and self.type & (HitObject.SLIDER | HitObject.SPINNER):
+            return str(self.to_object())
+        return HitObject.__str__(self)
+
+    def to_object(self):
+        """
+        Build a standalone HitObject with the values of this row.
+         :return: A HitCircle, Slider, Spinner or Hold.
+        """
+        return self._table.to_object(self._row)
+
+
+class HitObjectTable(object):
+    """
+    Columnar storage for hitobjects.
+    Every attribute common to all hitobjects is a typed array with one entry per object,
+    and custom sample filenames are stored once and referenced by index.
+    Indexing or iterating the table yields HitObjectView rows.
+    """
+
+    def __init__(self, objects=()):
+        self.x = array("i")
+        self.y = array("i")
+        self.time = array("d")
+        self.type = array("i")
+        self.hitsound = array("i")
+        self.sample_set = array("i")
+        self.addition_set = array("i")
+        self.custom_set = array("i")
+        self.volume = array("i")
+        self.end_time = array("d")
+        """ End time of holds and spinners. For other objects, the same as their time. """
+
+        self.custom_sample = array("i")
+        """ Indices into self.samples. """
+
+        self.samples = [""]
+        """ Distinct custom sample filenames. The empty string is always at index 0. """
+
+        self._sample_indices = {"": 0}
+
+        self.slider_data = {}
+        """ A dictionary from row to the slider-specific attributes of that row. """
+
+        self.modified = False
+        """ Whether any row has been changed or added since the table was last marked clean. """
+
+        self.extend(objects)
+
+    def intern_sample(self, filename):
+        """
+        Get the index of a custom sample filename, adding it if it's new.
+         :param filename: The sample filename.
+         :return: Index into self.samples.
+        """
+        index = self._sample_indices.get(filename)
+        if index is None:
+            index = len(self.samples)
+            self.samples.append(filename)
+            self._sample_indices[filename] = index
+        return index
+
+    def _append_row(self, x, y, time, kind, hitsound, sample_set, addition_set, custom_set, volume,
+                    custom_sample, end_time):
+        self.x.append(x)
+        self.y.append(y)
+        self.time.append(time)
+        self.type.append(kind)
+        self.hitsound.append(hitsound)
+        self.sample_set.append(sample_set)
+        self.addition_set.append(addition_set)
+        self.custom_set.append(custom_set)
+        self.volume.append(volume)
+        self.custom_sample.append(self.intern_sample(custom_sample))
+        self.end_time.append(end_time)
+        self.modified = True
+
+    def append(self, obj):
+        """
+        Add a hitobject to the end of the table.
+         :param obj: The HitObject to copy the values of.
+        """
+        row = len(self.x)
+        end_time = float(getattr(obj, "end_time", obj.time))
+        kind = obj.type
+
+        if isinstance(obj, Slider):
+            self.slider_data[row] = {
+                "curve_type": obj.curve_type,
+                "repeat": obj.repeat,
+                "points": [dict(point) for point in obj.points],
+                "pixel_length": obj.pixel_length,
+                "edge_hitsound": obj.edge_hitsound,
+                "edge_addition": obj.edge_addition,
+            }
+
+        self._append_row(_to_int(obj.x), _to_int(obj.y), obj.time, kind, _to_int(obj.hitsound),
+                         _to_int(obj.sample_set), _to_int(obj.addition_set), _to_int(obj.custom_set),
+                         _to_int(obj.volume), obj.custom_sample or "", end_time)
+
+    def append_string(self, string):
+        """
+        Parse a line of the [HitObjects] section straight into the table,
+        without building an intermediate HitObject for circles, holds and spinners.
+         :param string: The line of the [HitObjects] section.
+        """
+        entries = string.split(",")
+        try:
+            kind = int(entries[3])
+        except (IndexError, ValueError):
+            raise ValueError("Invalid object string: {}".format(string))
+
+        if not kind & (HitObject.CIRCLE | HitObject.SPINNER | HitObject.HOLD) or \
+                (kind & HitObject.SLIDER and not kind & HitObject.CIRCLE):
+            self.append(HitObject.from_string(string))
+            return
+
+        try:
+            time = float(int(entries[2]))
+            if kind & HitObject.CIRCLE:
+                end_time = time
+                additions = entries[5].split(":")
+            elif kind & HitObject.SPINNER:
+                end_time = float(entries[5])
+                additions = entries[6].split(":")
+            else:
+                additions = entries[5].split(":")
+                end_time = float(int(additions[0]))
+                additions = additions[1:]
+
+            self._append_row(int(entries[0]), int(entries[1]), time, kind, int(entries[4]),
+                             _to_int(additions[0]) if len(additions) > 0 else 0,
+                             _to_int(additions[1]) if len(additions) > 1 else 0,
+                             _to_int(additions[2]) if len(additions) > 2 else 0,
+                             _to_int(additions[3]) if len(additions) > 3 else 0,
+                             additions[4] if len(additions) > 4 else "",
+                             end_time)
+        except (IndexError, ValueError) as e:
+            raise ValueError("Invalid object string: {}. Exception: {}".format(string, e))
+
+    def extend(self, objects):
+        for obj in objects:
+            self.append(obj)
+
+    def to_object(self, row):
+        """
+        Build a standalone HitObject from a row.
+         :param row: Row index.
+         :return: A HitCircle, Slider, Spinner or Hold.
+        """
+        kind = self.type[row]
+        info = (self.x[row], self.y[row], self.time[row], self.hitsound[row])
+        if kind & HitObject.CIRCLE:
+            ret = HitCircle(*info)
+            ret.type = kind
+        elif kind & HitObject.SLIDER:
+            ret = Slider(*info)
+            data = self.slider_data[row]
+            ret.type = kind
+            ret.curve_type = data["curve_type"]
+            ret.repeat = data["repeat"]
+            ret.points = [dict(point) for point in data["points"]]
+            ret.pixel_length = data["pixel_length"]
+            ret.edge_hitsound = data["edge_hitsound"]
+            ret.edge_addition = data["edge_addition"]
+        else:
+            ret = Spinner(*info) if kind & HitObject.SPINNER else Hold(*info)
+            ret.type = kind
+            end_time = self.end_time[row]
+            ret.end_time = int(end_time) if end_time.is_integer() else end_time
+
+        ret.sample_set = self.sample_set[row]
+        ret.addition_set = self.addition_set[row]
+        ret.custom_set = self.custom_set[row]
+        ret.volume = self.volume[row]
+        ret.custom_sample = self.samples[self.custom_sample[row]]
+        return ret
+
+    def to_objects(self):
+        """
+        :return: A list with a standalone HitObject per row.
+        """
+        return [self.to_object(row) for row in range(len(self))]
+
+    def iter_strings(self):
+        """
+        Format every row as a line of the [HitObjects] section, straight from the columns.
+         :return: An iterator of strings, without line terminators.
+        """
+        samples = self.samples
+        columns = zip(self.x, self.y, self.time, self.type, self.hitsound, self.sample_set, self.addition_set,
+                      self.custom_set, self.volume, self.custom_sample, self.end_time)
+        for row, (x, y, time, kind, hitsound, sample_set, addition_set, custom_set, volume, sample,
+                  end_time) in enumerate(columns):
+            if not kind & HitObject.CIRCLE and kind & HitObject.SLIDER:
+                yield str(self.to_object(row))
+                continue
+
+            if sample:
+                additive = "0:0:0:{}:{}".format(volume, samples[sample].strip("\""))
+            else:
+                additive = "{}:{}:{}:{}:".format(sample_set, addition_set, custom_set, volume)
+
+            if not kind & HitObject.CIRCLE and kind & (HitObject.SPINNER | HitObject.HOLD):
+                end_time = int(end_time) if end_time.is_integer() else end_time
+                separator = "," if kind & HitObject.SPINNER else ":"
+                additive = "{}{}{}".format(end_time, separator, additive)
+
+            yield "{},{},{},{},{},{}".format(x, y, int(time), kind, hitsound, additive)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [HitObjectView(self, row) for row in range(*item.indices(len(self)))]
+
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("HitObjectTable index out of range")
+        return HitObjectView(self, item)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield HitObjectView(self, row)
@@ -12,6 +12,8 @@ class SampleSet(object):
     SOFT = 2
     DRUM = 3
 
+    __slots__ = ("kind", "volume", "custom_set")
+
     def __init__(self, kind=set_kinds[0], volume=15, custom_set=0):
         self.kind = kind
         """
@@ -0,0 +1,104 @@
+import sys
+from bisect import bisect_left, bisect_right
+
+__author__ = 'Agka'
+
+
+class StoryboardSampleTable(object):
+    """
+    The storyboard samples of a beatmap: tuples of (time, layer, filename[, volume]), always sorted by time.
+    Samples at the same time keep the order they were added in.
+    Besides iteration, samples can be looked up by exact time or by time range without scanning the table.
+    Filenames are interned, as maps tend to repeat the same few samples over and over.
+    """
+
+    def __init__(self, samples=()):
+        self._samples = sorted((self._intern(x) for x in samples), key=lambda x: x[0])
+        self._times = [x[0] for x in self._samples]
+        self._by_time = {}
+        for sample in self._samples:
+            self._by_time.setdefault(sample[0], []).append(sample)
+
+    @staticmethod
+    def _intern(sample):
+        sample = tuple(sample)
+        if len(sample) > 2 and type(sample[2]) is str:
+            sample = sample[:2] + (sys.intern(sample[2]),) + sample[3:]
+        return sample
+
+    def __len__(self):
+        return len(self._samples)
+
+    def __iter__(self):
+        return iter(self._samples)
+
+    def __getitem__(self, index):
+        return self._samples[index]
+
+    def __contains__(self, sample):
+        return tuple(sample) in self._by_time.get(sample[0], ())
+
+    def __eq__(self, other):
+        if isinstance(other, StoryboardSampleTable):
+            return self._samples == other._samples
+        return NotImplemented
+
+    def __repr__(self):
+        return "StoryboardSampleTable({!r})".format(self._samples)
+
+    def add(self, sample):
+        """
+        Add a sample, after any other samples at the same time.
+         :param sample: A (time, layer, filename) or (time, layer, filename, volume) tuple.
+        """
+        sample = self._intern(sample)
+        time = sample[0]
+        if not self._times or self._times[-1] <= time:
+            # The usual case while reading a file.
+            self._samples.append(sample)
+            self._times.append(time)
+        else:
+            index = bisect_right(self._times, time)
+            self._samples.insert(index, sample)
+            self._times.insert(index, time)
+
+        self._by_time.setdefault(time, []).append(sample)
+
+    append = add
+
+    def extend(self, samples):
+        for sample in samples:
+            self.add(sample)
+
+    def remove(self, sample):
+        """
+        Remove the first sample equal to the given one.
+         :param sample: The sample tuple.
+         :raise ValueError: If there is no such sample.
+        """
+        sample = tuple(sample)
+        time = sample[0]
+        at_time = self._by_time.get(time)
+        if not at_time or sample not in at_time:
+            raise ValueError("{!r} is not in the storyboard samples.".format(sample))
+
+        at_time.remove(sample)
+        if not at_time:
+            del self._by_time[time]
+
+        start = bisect_left(self._times, time)
+        index = self._samples.index(sample, start)
+        del self._samples[index]
+        del self._times[index]
+
+    def at(self, time):
+        """
+        :return: The samples at exactly this time, in the order they were added.
+        """
+        return list(self._by_time.get(time, ()))
+
+    def between(self, start, end):
+        """
+        :return: The samples with start <= time < end, sorted by time.
+        """
+        return self._samples[bisect_left(self._times, start):bisect_left(self._times, end)]
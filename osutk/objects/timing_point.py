@@ -8,6 +8,8 @@ class TimingPoint(object):
     """ Timing point class that contains the relevant osu! information such as
         time, value, inherited, etc... """
 
+    __slots__ = ("time", "uninherited", "sample_set", "value", "beats_per_measure", "kiai")
+
     def __init__(self, time=-1, value=500, beats_per_measure=4, uninherited=1, sample_set=None, kiai=0):
         """
         Construct a Timing Point object.
@@ -0,0 +1,239 @@
+from array import array
+
+from .sampleset import SampleSet
+from .timing_point import TimingPoint
+
+__author__ = 'Agka'
+
+
+class SampleSetView(SampleSet):
+    """
+    The sample set of a TimingPointTable row, usable wherever a SampleSet is expected.
+    """
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        # Deliberately not calling SampleSet.__init__: all state lives in the table.
+        self._table = table
+        self._row = row
+
+    @property
+    def kind(self):
+        return SampleSet.kind_from_index(self._table.sample_kind[self._row])
+
+    @kind.setter
+    def kind(self, value):
+        self._table.sample_kind[self._row] = SampleSet.set_kinds.index(value)
+        self._table.modified = True
+
+    @property
+    def volume(self):
+        return self._table.volume[self._row]
+
+    @volume.setter
+    def volume(self, value):
+        self._table.volume[self._row] = value
+        self._table.modified = True
+
+    @property
+    def custom_set(self):
+        return self._table.custom_set[self._row]
+
+    @custom_set.setter
+    def custom_set(self, value):
+        self._table.custom_set[self._row] = value
+        self._table.modified = True
+
+    def get_osu_kind_index(self):
+        return self._table.sample_kind[self._row]
+
+
+class TimingPointView(TimingPoint):
+    """
+    A row of a TimingPointTable, usable wherever a TimingPoint is expected.
+    Reading or writing its attributes reads or writes the table columns.
+    """
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        # Deliberately not calling TimingPoint.__init__: all state lives in the table.
+        self._table = table
+        self._row = row
+
+    def _column(name):
+        def get(self):
+            return getattr(self._table, name)[self._row]
+
+        def set(self, value):
+            getattr(self._table, name)[self._row] = value
+            self._table.modified = True
+
+        return property(get, set)
+
+    time = _column("time")
+    value = _column("value")
+    beats_per_measure = _column("beats_per_measure")
+    uninherited = _column("uninherited")
+    kiai = _column("kiai")
+    del _column
+
+    @property
+    def sample_set(self):
+        return SampleSetView(self._table, self._row)
+
+    @sample_set.setter
+    def sample_set(self, value):
+        self._table.sample_kind[self._row] = value.get_osu_kind_index()
+        self._table.custom_set[self._row] = value.custom_set
+        self._table.volume[self._row] = value.volume
+        self._table.modified = True
+
+    def to_object(self):
+        """
+        Build a standalone TimingPoint with the values of this row.
+         :return: The TimingPoint.
+        """
+        return self._table.to_object(self._row)
+
+
+class TimingPointTable(object):
+    """
+    Columnar storage for timing points, one typed array per attribute.
+    Indexing or iterating the table yields TimingPointView rows, built only when asked for.
+    """
+
+    def __init__(self, timing_points=()):
+        self.time = array("d")
+        self.value = array("d")
+        self.beats_per_measure = array("d")
+        self.sample_kind = array("b")
+        """ Sample set kinds, as indices of SampleSet.set_kinds. """
+
+        self.custom_set = array("i")
+        self.volume = array("d")
+        self.uninherited = array("b")
+        self.kiai = array("b")
+
+        self.modified = False
+        """ Whether any row has been changed or added since the table was last marked clean. """
+
+        self.extend(timing_points)
+
+    def _append_row(self, time, value, beats_per_measure, sample_kind, custom_set, volume, uninherited, kiai):
+        self.time.append(time)
+        self.value.append(value)
+        self.beats_per_measure.append(beats_per_measure)
+        self.sample_kind.append(sample_kind)
+        self.custom_set.append(custom_set)
+        self.volume.append(volume)
+        self.uninherited.append(uninherited)
+        self.kiai.append(kiai)
+        self.modified = True
+
+    def append(self, timing_point):
+        """
+        Add a timing point to the end of the table.
+         :param timing_point: The TimingPoint to copy the values of.
+        """
+        sample_set = timing_point.sample_set
+        self._append_row(timing_point.time, timing_point.value, timing_point.beats_per_measure,
+                         sample_set.get_osu_kind_index(), sample_set.custom_set, sample_set.volume,
+                         1 if timing_point.uninherited else 0, 1 if timing_point.kiai else 0)
+
+    def extend(self, timing_points):
+        for timing_point in timing_points:
+            self.append(timing_point)
+
+    def append_string(self, string):
+        """
+        Parse a line of the [TimingPoints] section straight into the table.
+        Missing trailing fields take the same defaults as TimingPoint.from_string.
+         :param string: The line to parse.
+        """
+        fields = list(map(float, string.split(",")))
+        if len(fields) < 8:
+            # time, value, meter, sample kind, custom set, volume, uninherited, kiai
+            fields += [-1, 500, 4, 0, 0, 15, 1, 0][len(fields):]
+
+        sample_kind = int(fields[3])
+        self._append_row(fields[0], fields[1], fields[2],
+                         sample_kind if 0 <= sample_kind < 4 else 0,
+                         int(fields[4]), fields[5],
+                         1 if fields[6] != 0 else 0,
+                         1 if fields[7] != 0 else 0)
+
+    @staticmethod
+    def from_string(string):
+        """
+        Parse the body of a [TimingPoints] section in one go.
+         :param string: The lines of the section, without its header.
+         :return: The new TimingPointTable.
+        """
+        table = TimingPointTable()
+        for line in string.splitlines():
+            line = line.strip()
+            if line:
+                table.append_string(line)
+        return table
+
+    def sort(self):
+        """
+        Sort the rows by time, in place. Rows at the same time keep their order.
+        """
+        order = sorted(range(len(self)), key=self.time.__getitem__)
+        if order == list(range(len(self))):
+            return
+
+        for name in ("time", "value", "beats_per_measure", "sample_kind", "custom_set", "volume",
+                     "uninherited", "kiai"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in order)))
+        self.modified = True
+
+    def to_object(self, row):
+        """
+        Build a standalone TimingPoint from a row.
+         :param row: Row index.
+         :return: The TimingPoint.
+        """
+        sample_set = SampleSet(SampleSet.kind_from_index(self.sample_kind[row]),
+                               self.volume[row],
+                               self.custom_set[row])
+        return TimingPoint(self.time[row], self.value[row], self.beats_per_measure[row],
+                           self.uninherited[row], sample_set, self.kiai[row])
+
+    def to_objects(self):
+        """
+        :return: A list with a standalone TimingPoint per row.
+        """
+        return [self.to_object(row) for row in range(len(self))]
+
+    def iter_strings(self):
+        """
+        Format every row as a line of the [TimingPoints] section, straight from the columns.
+         :return: An iterator of strings, without line terminators.
+        """
+        columns = zip(self.time, self.value, self.beats_per_measure, self.sample_kind, self.custom_set,
+                      self.volume, self.uninherited, self.kiai)
+        for time, value, beats_per_measure, sample_kind, custom_set, volume, uninherited, kiai in columns:
+            yield "{},{},{},{},{},{},{},{}".format(int(time), value, int(beats_per_measure), sample_kind,
+                                                   custom_set, int(volume), uninherited, kiai)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [TimingPointView(self, row) for row in range(*item.indices(len(self)))]
+
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("TimingPointTable index out of range")
+        return TimingPointView(self, item)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield TimingPointView(self, row)
@@ -1,3 +1,7 @@
 __author__ = 'Agka'
 
-from .beatmap import Beatmap, Color, read_from_file, replace_timing_section
+from .beatmap import Beatmap, Color, read_from_file, replace_timing_section, SectionPatcher
+from .bulk import BeatmapInfo, find_beatmaps, load_beatmap, iter_beatmaps, iter_metadata
+from .parallel import MapResult, map_beatmaps
+from .cache import BeatmapCache
+from .binary import save, load
@@ -1,6 +1,17 @@
+import mmap
+import os
 import re
+import shutil
+import tempfile
+from array import array
+from collections import namedtuple
+from bisect import bisect_left, bisect_right
+from osutk._io import write_lines
 from osutk.objects.timing_point import TimingPoint
-from osutk.objects.hitobject import HitObject
+from osutk.objects.hitobject import HitObject, intern_sample
+from osutk.objects.hitobject_table import HitObjectTable
+from osutk.objects.timing_point_table import TimingPointTable
+from osutk.objects.storyboard_sample_table import StoryboardSampleTable
 
 __author__ = 'Agka'
 
@@ -20,46 +31,88 @@ class Color(object):
 
 
 class Hitsound(object):
-    def __init__(self, sample_set=0, custom_set=0, hitsound=0, is_auto=True, custom_sample="", obj=None):
-        self.sample_set = sample_set
-        self.custom_set = custom_set
-        self.hitsound = hitsound
-        self._is_auto = is_auto
-        self.custom_sample = custom_sample
-        self.obj = obj
+    """
+    A single sound: either a custom sample, or a sample set, custom set and hitsound.
+    Hitsounds are immutable flyweights: constructing a Hitsound equal to an existing one returns that same instance,
+    so they're cheap to build, hash and compare, and safe to use as set members and dictionary keys.
+    Values that don't take part in equality aren't kept: a custom sample has sets and hitsound 0,
+    and a custom sample name of 4 characters or less is dropped.
+    To change a sound, build a new one.
+    """
+    __slots__ = ("sample_set", "custom_set", "hitsound", "_is_auto", "custom_sample", "is_auto", "is_custom_sample",
+                 "_key", "_hash")
 
+    _instances = {}
+
+    def __new__(cls, sample_set=0, custom_set=0, hitsound=0, is_auto=True, custom_sample=""):
         if custom_sample != "":
-            self._is_auto = False
+            is_auto = False
 
-    @property
-    def is_auto(self):
+        is_custom_sample = len(custom_sample) > 4
+        key = custom_sample if is_custom_sample else (sample_set, custom_set, hitsound, is_auto)
+        instance = cls._instances.get(key)
+        if instance is not None:
+            return instance
+
+        # Only what the key holds is stored, so a shared instance doesn't depend on which call created it.
+        if is_custom_sample:
+            sample_set = custom_set = hitsound = 0
+        else:
+            custom_sample = ""
+
+        instance = object.__new__(cls)
+        set_attribute = object.__setattr__
+        set_attribute(instance, "sample_set", sample_set)
+        set_attribute(instance, "custom_set", custom_set)
+        set_attribute(instance, "hitsound", hitsound)
+        set_attribute(instance, "_is_auto", is_auto)
+        set_attribute(instance, "custom_sample", intern_sample(custom_sample))
+        set_attribute(instance, "is_custom_sample", is_custom_sample)
+        # Whether this hitsound had a sample assigned to it or if it was set automatically.
+        set_attribute(instance, "is_auto", False if is_custom_sample else is_auto)
+        set_attribute(instance, "_key", key)
+        set_attribute(instance, "_hash", hash(key))
+        cls._instances[key] = instance
+        return instance
+
+    @classmethod
+    def get(cls, sample_set=0, custom_set=0, hitsound=0, is_auto=True, custom_sample=""):
         """
-        @return: Whether this hitsound had a sample assigned to it or if it was set automatically.
+        Same as the constructor: get the shared instance for these values.
         """
-        return False if len(self.custom_sample) > 4 else self._is_auto
-
-    @property
-    def is_custom_sample(self):
-        return len(self.custom_sample) > 4
+        return cls(sample_set, custom_set, hitsound, is_auto, custom_sample)
 
-    def __hash__(self):
-        if len(self.custom_sample) > 4:
-            return hash(self.custom_sample)
+    def __setattr__(self, key, value):
+        raise AttributeError("Hitsounds are immutable, build a new one instead.")
 
-        return hash((self.sample_set, self.custom_set, self.hitsound, self._is_auto))
+    def __reduce__(self):
+        return Hitsound, (self.sample_set, self.custom_set, self.hitsound, self._is_auto, self.custom_sample)
 
-    def __eq__(self, other):
-        if len(self.custom_sample) > 4:
-            eq1 = self.custom_sample
-        else:
-            eq1 = (self.sample_set, self.custom_set, self.hitsound, self._is_auto)
+    def replace(self, **changes):
+        """
+        Get the hitsound with some of the values of this one changed.
+         :param changes: Any of sample_set, custom_set, hitsound, is_auto and custom_sample.
+         :return: The Hitsound.
+        """
+        values = {
+            "sample_set": self.sample_set,
+            "custom_set": self.custom_set,
+            "hitsound": self.hitsound,
+            "is_auto": self._is_auto,
+            "custom_sample": self.custom_sample,
+        }
+        values.update(changes)
+        return Hitsound(**values)
 
-        if len(other.custom_sample) > 4:
-            eq2 = other.custom_sample
-        else:
-            eq2 = (other.sample_set, other.custom_set, other.hitsound, other._is_auto)
+    def __hash__(self):
+        return self._hash
 
-        return eq1 == eq2
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Hitsound):
+            return NotImplemented
+        return self._key == other._key
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -74,27 +127,271 @@ class Hitsound(object):
         if item == 3:
             return self.is_auto
 
-    def __setitem__(self, key, value):
-        if key == 0:
-            self.sample_set = value
-        if key == 1:
-            self.custom_set = value
-        if key == 2:
-            self.hitsound = value
-        if key == 3:
-            self._is_auto = value
+    def __repr__(self):
+        if self.is_custom_sample:
+            return "Hitsound(custom_sample={!r})".format(self.custom_sample)
+        return "Hitsound({}, {}, {}, {})".format(self.sample_set, self.custom_set, self.hitsound, self._is_auto)
+
+
+class _ObjectTimeIndex(object):
+    """
+    Objects of a beatmap grouped and sorted by time.
+    Remembers which object list it was built from and its length, so it can tell when it's stale.
+    Changes that keep both, like replacing an object in place, need Beatmap.invalidate_object_index.
+    """
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.count = len(objects)
+
+        self.by_time = {}
+        for obj in objects:
+            group = self.by_time.get(obj.time)
+            if group is None:
+                self.by_time[obj.time] = [obj]
+            else:
+                group.append(obj)
+
+        self.times = sorted(self.by_time)
+        """ Distinct object times, ascending. """
+
+        self.starts = []
+        """ For each distinct time, the position of its first object in self.sorted_objects. """
+
+        self.sorted_objects = []
+        for t in self.times:
+            self.starts.append(len(self.sorted_objects))
+            self.sorted_objects.extend(self.by_time[t])
+
+    def is_valid_for(self, objects):
+        return self.objects is objects and self.count == len(objects)
+
+    def in_range(self, start, end):
+        first = bisect_left(self.times, start)
+        last = bisect_left(self.times, end)
+        begin = self.starts[first] if first < len(self.starts) else len(self.sorted_objects)
+        stop = self.starts[last] if last < len(self.starts) else len(self.sorted_objects)
+        return self.sorted_objects[begin:stop]
+
+
+class _LaneIndex(object):
+    """
+    Objects of a mania beatmap split by lane, each lane sorted by time, built from an _ObjectTimeIndex.
+    Stale once the time index is rebuilt or the lane count changes.
+    """
+
+    def __init__(self, time_index, lane_count):
+        self.time_index = time_index
+        self.lane_count = lane_count
+
+        lane_width = 512.0 / lane_count
+        self.objects = {}
+        for obj in time_index.sorted_objects:
+            if obj.x > 512.0:
+                raise ValueError("The object's X (={}) is out of range.".format(obj.x))
+
+            lane = int(obj.x / lane_width)
+            objects = self.objects.get(lane)
+            if objects is None:
+                self.objects[lane] = [obj]
+            else:
+                objects.append(obj)
+
+        self.start_times = {}
+        """ For each lane, an array of the times of its objects. """
+
+        self.end_times = {}
+        """ For each lane, an array of the end times of its objects: the time they're released or end at. """
+
+        for lane, objects in self.objects.items():
+            self.start_times[lane] = array("d", [obj.time for obj in objects])
+            self.end_times[lane] = array("d", [float(getattr(obj, "end_time", obj.time)) for obj in objects])
+
+    def is_valid_for(self, time_index, lane_count):
+        return self.time_index is time_index and self.lane_count == lane_count
+
+
+class _TimingIndex(object):
+    """
+    Timing points of a beatmap sorted by time, for effective timing point lookups.
+    Like _ObjectTimeIndex, remembers the list it was built from to tell when it's stale.
+    Positions refer to the time-sorted order, not to the declaration order.
+    """
+
+    def __init__(self, timing_points):
+        self.timing_points = timing_points
+        self.count = len(timing_points)
+
+        if isinstance(timing_points, TimingPointTable):
+            point_times = timing_points.time
+        else:
+            point_times = [x.time for x in timing_points]
+
+        self.order = sorted(range(self.count), key=point_times.__getitem__)
+        """ Declaration index of the timing point at each sorted position. """
+
+        self.times = [point_times[i] for i in self.order]
+
+        # When several points share a time, the first declared one is the effective one.
+        self.effective = []
+        for i, t in enumerate(self.times):
+            self.effective.append(self.effective[-1] if i > 0 and self.times[i - 1] == t else i)
+
+        self._points = {}
+
+    def is_valid_for(self, timing_points):
+        return self.timing_points is timing_points and self.count == len(timing_points)
+
+    def point(self, position):
+        # Cached so timing point tables hand out the same view every time.
+        point = self._points.get(position)
+        if point is None:
+            point = self._points[position] = self.timing_points[self.order[position]]
+        return point
+
+    def effective_position(self, time):
+        index = bisect_right(self.times, time) - 1
+        return self.effective[index] if index >= 0 else 0
+
+    def effective_positions(self, times):
+        point_times = self.times
+        point_count = len(point_times)
+        result = []
+        current = 0
+        for time in times:
+            while current + 1 < point_count and point_times[current + 1] <= time:
+                current += 1
+            result.append(self.effective[current])
+        return result
+
+
+class _SectionAttribute(object):
+    """
+    Beatmap attribute filled from one or more .osu sections.
+    If the beatmap was opened lazily, the sections are parsed the first time the attribute is read.
+    Assigning to the attribute discards the pending sections it would have been parsed from,
+    unless another attribute is filled from the same section: then the section is parsed first, so that one keeps
+    its value.
+    If convert is given, assigned values are passed through it.
+    """
+
+    def __init__(self, *sections, convert=None):
+        self.sections = sections
+        self.convert = convert
+        self.attribute = None
+        self.shared_sections = ()
+
+    def __set_name__(self, owner, name):
+        self.attribute = "_" + name
+
+        for other in vars(owner).values():
+            if isinstance(other, _SectionAttribute) and other is not self:
+                shared = set(self.sections) & set(other.sections)
+                if shared:
+                    self.shared_sections = tuple(set(self.shared_sections) | shared)
+                    other.shared_sections = tuple(set(other.shared_sections) | shared)
+
+    def __get__(self, beatmap, owner=None):
+        if beatmap is None:
+            return self
+
+        if beatmap._pending_sections:
+            for section in self.sections:
+                beatmap._load_section(section)
+
+        return getattr(beatmap, self.attribute)
+
+    def __set__(self, beatmap, value):
+        for section in self.shared_sections:
+            beatmap._load_section(section)
+
+        for section in self.sections:
+            beatmap._pending_sections.pop(section, None)
+
+        if self.convert is not None and not isinstance(value, self.convert):
+            value = self.convert(value)
+        setattr(beatmap, self.attribute, value)
+
+
+class ResolvedSounds(namedtuple("ResolvedSounds", ("obj", "time", "sample_set", "addition_set",
+                                                   "custom_set", "hitsound", "is_auto", "custom_sample"))):
+    """
+    The effective sounds of a hitobject, as computed by Beatmap.resolve_all_sounds.
+    sample_set and addition_set are the effective sets after falling back to the timing point,
+    hitsound holds the sound bits of the object and is_auto whether all of its sounds are deduced from context.
+    """
+    __slots__ = ()
+
+    @property
+    def is_custom_sample(self):
+        return len(self.custom_sample) > 4
+
+    def sounds(self):
+        """
+        Expand this record into the Hitsounds Beatmap.get_effective_sounds returns.
+         :return: [Hitsound]
+        """
+        if len(self.custom_sample) > 4:
+            return [Hitsound(custom_sample=self.custom_sample, is_auto=False)]
+
+        if self.hitsound != 0:  # has an addition
+            return [Hitsound(self.addition_set, self.custom_set, hitsound_type, False)
+                    for hitsound_type in HitObject.SOUND_TYPES
+                    if self.hitsound & hitsound_type]
+
+        return [Hitsound(self.sample_set, self.custom_set, HitObject.SND_NORMAL, self.is_auto)]
+
+
+def _resolve_sounds(obj, timing_sample_set):
+    """
+    Resolve the sounds of an object given the sample set index of the timing point in effect at its time.
+    """
+    sample_set = obj.sample_set if obj.sample_set != 0 else timing_sample_set
+    if obj.addition_set != 0:
+        addition_set = obj.addition_set
+    else:
+        addition_set = sample_set
+
+    is_auto = obj.hitsound == 0 and obj.custom_set == 0 and obj.sample_set == 0 and len(obj.custom_sample) <= 4
+    return ResolvedSounds(obj, obj.time, sample_set, addition_set, obj.custom_set, obj.hitsound,
+                          is_auto, obj.custom_sample)
 
 
 class Beatmap(object):
+    timing_points = _SectionAttribute("TimingPoints")
+    objects = _SectionAttribute("HitObjects")
+    colors = _SectionAttribute("Colours", "Colors")
+    events = _SectionAttribute("Events")
+    sb_samples = _SectionAttribute("Events", convert=StoryboardSampleTable)
+    metadata = _SectionAttribute("Metadata")
+    general = _SectionAttribute("General")
+    difficulty = _SectionAttribute("Difficulty")
+    editor = _SectionAttribute("Editor")
+
     def __init__(self):
+        self._source_filename = None
+        self._source_stamp = None
+        self._object_index = None
+        self._lane_index = None
+        self._timing_index = None
+        self._section_ranges = {}
+        """ Byte ranges of every known section of the source file, when opened lazily. """
+
+        self._pending_sections = {}
+        """ Byte ranges of the sections that have not been parsed yet, when opened lazily. """
+
+        self._loaded_tables = {}
+        """ The HitObjectTable or TimingPointTable each section was lazily parsed into. """
 
         # missing: Metadata, version, mode, etcetera
 
         self.timing_points = []
-        """ A list containing all timing points for this beatmap. """
+        """ A list containing all timing points for this beatmap.
+        When read with columnar=True, a TimingPointTable instead. """
 
         self.objects = []
-        """ A list containing all objects for this beatmap. """
+        """ A list containing all objects for this beatmap.
+        When read with columnar=True, a HitObjectTable instead. """
 
         self.colors = {}
         """ A dictionary containing the colors used on the beatmap.
@@ -107,7 +404,8 @@ class Beatmap(object):
         """
 
         self.sb_samples = []
-        """ A list containing tuples of (time, layer, filename, volume) from sample events from the storyboard. """
+        """ A StoryboardSampleTable of the (time, layer, filename, volume) tuples of sample events from the storyboard,
+        sorted by time. Any iterable of such tuples can be assigned to it. """
 
         self.metadata = lambda: None
         """ Metadata for this beatmap. Does not follow python naming conventions!
@@ -131,6 +429,71 @@ class Beatmap(object):
         Same, but the [Editor] section.
         """
 
+    def _load_section(self, section):
+        """
+        Parse a section that was left pending by a lazy load.
+         :param section: Name of the section, as it appears between brackets.
+        """
+        byte_range = self._pending_sections.pop(section, None)
+        if byte_range is None:
+            return
+
+        self._parse_section(section, self._read_source(*byte_range))
+
+    def _parse_section(self, section, text):
+        """
+        Parse the text of a section into this beatmap.
+         :param section: Name of the section, as it appears between brackets.
+         :param text: The lines of the section, without its header.
+        """
+        reader = _SECTION_READERS.get(section)
+        if reader is None:
+            return
+
+        for line in text.splitlines():
+            line = line.rstrip()
+            if line:
+                reader(self, line)
+
+        table = {"HitObjects": self._objects, "TimingPoints": self._timing_points}.get(section)
+        if isinstance(table, (HitObjectTable, TimingPointTable)):
+            table.modified = False
+            self._loaded_tables[section] = table
+
+    def _read_source(self, start, end):
+        if _file_stamp(self._source_filename) != self._source_stamp:
+            raise ValueError("{} changed after it was lazily opened.".format(self._source_filename))
+
+        with open(self._source_filename, "rb") as in_file:
+            in_file.seek(start)
+            return in_file.read(end - start).decode("utf-8")
+
+    def _get_unmodified_section(self, section):
+        """
+        Get the original text of a section, if it's known not to have changed since the beatmap was lazily opened:
+        either it was never parsed, or it was parsed into a table that has not been modified or replaced since.
+         :param section: Name of the section.
+         :return: The text of the section, without its header, or None.
+        """
+        byte_range = self._section_ranges.get(section)
+        if byte_range is None:
+            return None
+
+        if section not in self._pending_sections:
+            table = self._loaded_tables.get(section)
+            current = {"HitObjects": self._objects, "TimingPoints": self._timing_points}.get(section)
+            if table is None or table is not current or table.modified:
+                return None
+
+        return self._read_source(*byte_range).replace("\r\n", "\n")
+
+    def load_all_sections(self):
+        """
+        Parse every section still pending from a lazy load.
+        """
+        for section in list(self._pending_sections):
+            self._load_section(section)
+
     @property
     def audio(self):
         return self.metadata.AudioFilename
@@ -165,15 +528,38 @@ class Beatmap(object):
     def lane_count(self, new_count):
         self.difficulty.CircleSize = new_count
 
+    def _get_object_index(self):
+        objects = self.objects
+        if self._object_index is None or not self._object_index.is_valid_for(objects):
+            self._object_index = _ObjectTimeIndex(objects)
+        return self._object_index
+
+    def _get_lane_index(self):
+        time_index = self._get_object_index()
+        lane_count = int(self.lane_count)
+        if self._lane_index is None or not self._lane_index.is_valid_for(time_index, lane_count):
+            self._lane_index = _LaneIndex(time_index, lane_count)
+        return self._lane_index
+
+    def invalidate_object_index(self):
+        """
+        Discard the cached time and lane indices of the objects.
+        The indices only remember which list they were built from and its length. Assigning a new list,
+        adding or removing objects and changing the lane count are noticed automatically; call this after any
+        change that keeps the same list at the same length: replacing an object in place (objects[i] = obj),
+        removing and adding as many objects, or changing the time or the position of an object.
+        """
+        self._object_index = None
+        self._lane_index = None
+
     def get_object_at_time(self, time):
         """
         Get the first declared hitobject at time.
          :param time: Time to look for a hitobject.
          :return: The HitObject.
         """
-        for x in filter(lambda o: o.time == time, self.objects):
-            return x
-        return None
+        group = self._get_object_index().by_time.get(time)
+        return group[0] if group else None
 
     def get_objects_at_time(self, time: float):
         """
@@ -181,7 +567,16 @@ class Beatmap(object):
          :param time: Time to look for hitobjects.
          :return: [HitObject]
         """
-        return list(filter(lambda o: o.time == time, self.objects))
+        return list(self._get_object_index().by_time.get(time, ()))
+
+    def get_objects_in_range(self, start: float, end: float):
+        """
+        Get the objects whose time is within [start, end).
+         :param start: Start of the range, inclusive.
+         :param end: End of the range, exclusive.
+         :return: [HitObject] sorted by time. Objects at the same time are in declaration order.
+        """
+        return self._get_object_index().in_range(start, end)
 
     def get_mania_lane(self, hitobject):
         """
@@ -202,7 +597,22 @@ class Beatmap(object):
         return int(lane * lane_width + lane_width / 2)
 
     def get_lane_objects(self, lane):
-        return [hitobject for hitobject in self.objects if self.get_mania_lane(hitobject) == lane]
+        """
+        Get the objects of a mania lane.
+         :param lane: The lane, in the range of [0, Channels).
+         :return: [HitObject] sorted by time. Objects at the same time are in declaration order.
+        """
+        return list(self._get_lane_index().objects.get(lane, ()))
+
+    def get_lane_times(self, lane):
+        """
+        Get the start and end times of the objects of a mania lane, in the order of get_lane_objects.
+        The end time of an object is the time it's released or ends at, or its time if it has no duration.
+         :param lane: The lane, in the range of [0, Channels).
+         :return: (start times, end times), as two arrays of floats.
+        """
+        index = self._get_lane_index()
+        return array("d", index.start_times.get(lane, ())), array("d", index.end_times.get(lane, ()))
 
     def get_last_object_time(self):
         return max([x.time for x in self.objects])
@@ -214,19 +624,52 @@ class Beatmap(object):
         return [x for x in self.timing_points if x.uninherited == 0]
 
     def sort_timing_points(self):
-        self.timing_points = list(sorted(self.timing_points, key=lambda x: x.time))
+        if isinstance(self.timing_points, TimingPointTable):
+            self.timing_points.sort()
+            self.invalidate_timing_index()
+        else:
+            self.timing_points = list(sorted(self.timing_points, key=lambda x: x.time))
 
-    # Assumes times are sorted
-    def get_effective_timing_point(self, time):
-        current = self.timing_points[0]
-        for tp in self.timing_points:
-            if time >= tp.time > current.time:
-                current = tp
+    def _get_timing_index(self):
+        timing_points = self.timing_points
+        if self._timing_index is None or not self._timing_index.is_valid_for(timing_points):
+            self._timing_index = _TimingIndex(timing_points)
+        return self._timing_index
 
-            if tp.time > time:
-                break
+    def invalidate_timing_index(self):
+        """
+        Discard the cached timing point lookup table.
+        Like the object index, it only remembers which list it was built from and its length.
+        Assigning a new list, adding or removing timing points and sort_timing_points are noticed automatically;
+        call this after any change that keeps the same list at the same length: replacing a timing point in place
+        (timing_points[i] = point), removing and adding as many, sorting the list directly,
+        or changing the time of a timing point.
+        """
+        self._timing_index = None
+
+    def get_effective_timing_point(self, time):
+        """
+        Get the timing point in effect at a time: the last one at or before it,
+        or the first timing point if time comes before all of them.
+        Of several timing points at the same time, the first declared one is used.
+         :param time: Time in milliseconds.
+         :return: The TimingPoint.
+        """
+        index = self._get_timing_index()
+        if not index.count:
+            raise IndexError("The beatmap has no timing points.")
+        return index.point(index.effective_position(time))
 
-        return current
+    def get_effective_timing_points(self, times):
+        """
+        Get the timing point in effect at each of many times in a single pass.
+         :param times: Times in milliseconds, sorted in ascending order.
+         :return: A list with the effective TimingPoint for each time.
+        """
+        index = self._get_timing_index()
+        if not index.count:
+            raise IndexError("The beatmap has no timing points.")
+        return [index.point(position) for position in index.effective_positions(times)]
 
     def get_effective_sample_set(self, obj):
         if obj.sample_set != 0:
@@ -253,33 +696,35 @@ class Beatmap(object):
         the sound, soundset and index are all deduced from context.
         """
         if len(obj.custom_sample) > 4:
-            return [Hitsound(custom_sample=obj.custom_sample, obj=obj, is_auto=False)]
+            return [Hitsound(custom_sample=obj.custom_sample, is_auto=False)]
 
-        if obj.hitsound != 0:  # has an addition
-            sounds_list = []
+        timing_sample_set = self.get_effective_timing_point(obj.time).sample_set.get_osu_kind_index()
+        return _resolve_sounds(obj, timing_sample_set).sounds()
 
-            # if it has a SND_NORMAL, add an SND_NORMAL with the addition set and custom set indicated.
-            for hitsound_type in HitObject.SOUND_TYPES:
-                addition_set = self.get_effective_addition_set(obj)
-                if obj.hitsound & hitsound_type:
-                    custom_set = obj.custom_set if obj.custom_set == 0 \
-                        else self.get_effective_timing_point(obj.time).custom_set
+    def resolve_all_sounds(self):
+        """
+        Resolve the effective sounds of every object in a single pass over the objects in time order.
+        Unlike get_effective_sounds, no Hitsound is built unless ResolvedSounds.sounds() is called.
+         :return: An iterator of ResolvedSounds, sorted by time.
+          Objects at the same time keep their declaration order.
+        """
+        index = self._get_object_index()
+        if not index.times:
+            return
 
-                    sounds_list.append(Hitsound(addition_set, custom_set, hitsound_type, False, obj=obj))
+        timing_index = self._get_timing_index()
+        if not timing_index.count:
+            raise IndexError("The beatmap has no timing points.")
 
-            return sounds_list
-        else:
-            custom_set = obj.custom_set if obj.custom_set == 0 \
-                else self.get_effective_timing_point(obj.time).custom_set
-
-            sampleset = self.get_effective_sample_set(obj)
-            return [Hitsound(
-                sampleset,
-                custom_set,
-                HitObject.SND_NORMAL,
-                obj.custom_set == 0 and obj.sample_set == 0,
-                obj=obj
-            )]
+        timing_sample_sets = {}
+        for t, position in zip(index.times, timing_index.effective_positions(index.times)):
+            timing_sample_set = timing_sample_sets.get(position)
+            if timing_sample_set is None:
+                timing_sample_set = timing_sample_sets[position] = \
+                    timing_index.point(position).sample_set.get_osu_kind_index()
+
+            for obj in index.by_time[t]:
+                yield _resolve_sounds(obj, timing_sample_set)
 
     def get_sv_time_pairs(self):
         return [
@@ -288,152 +733,465 @@ class Beatmap(object):
         ]
 
     def get_distinct_times(self):
-        return set(x.time for x in self.objects)
+        return set(self._get_object_index().times)
 
     def get_storyboard_samples(self):
         pass
 
 
-def read_from_file(filename):
+def _read_attributes(area, line):
+    line = line.split(":")
+    attribute = line[0].strip() if len(line) > 0 else None
+    value = line[1].strip() if len(line) > 1 else None
+
+    # turn metadata into python attributes; attribute: value
+    if attribute is not None and value is not None:
+        setattr(area, attribute, value)
+
+
+_COLOR_REGEX = re.compile(r"\s*Combo(\d+)\s*:\s*(\d{0,3}),(\d{0,3}),(\d{0,3})\s*")
+
+
+def _read_color(beatmap, line):
+    match = _COLOR_REGEX.match(line)
+    if match is not None:
+        beatmap._colors[int(match.group(1))] = Color(r=int(match.group(2)),
+                                                    g=int(match.group(3)),
+                                                    b=int(match.group(4)))
+
+
+def _read_event(beatmap, line):
+    stripped = line.lstrip(' _')
+    if stripped.startswith("Sample"):
+        entries = stripped.split(',')[1:]
+        beatmap._sb_samples.append((int(entries[0]), *entries[1:]))
+    else:
+        beatmap._events.append(line)
+
+
+def _read_timing(beatmap, line):
+    timing_points = beatmap._timing_points
+    if type(timing_points) is TimingPointTable:
+        timing_points.append_string(line)
+    else:
+        timing_points.append(TimingPoint.from_string(line))
+
+
+def _read_hitobject(beatmap, line):
+    objects = beatmap._objects
+    if type(objects) is HitObjectTable:
+        objects.append_string(line)
+    else:
+        objects.append(HitObject.from_string(line))
+
+
+# Per-section line handlers. Lines of sections not in here are skipped.
+_SECTION_READERS = {
+    "General": lambda beatmap, line: _read_attributes(beatmap._general, line),
+    "Editor": lambda beatmap, line: _read_attributes(beatmap._editor, line),
+    "Metadata": lambda beatmap, line: _read_attributes(beatmap._metadata, line),
+    "Difficulty": lambda beatmap, line: _read_attributes(beatmap._difficulty, line),
+    "Events": _read_event,
+    "TimingPoints": _read_timing,
+    "Colours": _read_color,
+    "Colors": _read_color,
+    "HitObjects": _read_hitobject,
+}
+
+_VERSION_REGEX = re.compile(r"osu file format v(\d+)")
+
+
+def _read_stream(beatmap, stream):
     """
-    Read a osu! beatmap from a osufile.
-     :param filename: File to read from.
-     :return: The beatmap object
+    Read all lines of a text stream into beatmap in a single pass,
+    handing each line to the reader of the section it belongs to.
     """
-    output = Beatmap()
-    section_dict = {}
-
-    # internal methods
-    def read_timing(beatmap, line):
-        beatmap.timing_points.append(TimingPoint.from_string(line))
-
-    def read_attributes(area, line):
-        line = line.split(":")
-        attribute = line[0].strip() if len(line) > 0 else None
-        value = line[1].strip() if len(line) > 1 else None
-
-        # turn metadata into python attributes; attribute: value
-        if attribute is not None and value is not None:
-            setattr(area, attribute, value)
-
-    def read_color(colors, line):
-        color_regex = r"\s*Combo(\d+)\s*:\s*(\d{0,3}),(\d{0,3}),(\d{0,3})\s*"
-        match = re.match(color_regex, line)
-        if match is not None:
-            colors[int(match.group(1))] = Color(r=int(match.group(2)), g=int(match.group(3)), b=int(match.group(4)))
-
-    def read_event(events, samples, line):
-        if line.lstrip(' _').startswith("Sample"):
-            entries = line.lstrip(' _').split(',')[1:]
-            samples.append((int(entries[0]), *entries[1:]))
-        else:
-            events.append(line)
+    lines = iter(stream)
+
+    # Read the version.
+    for line in lines:
+        match = _VERSION_REGEX.search(line)
+        if match is None:
+            raise ValueError("Not a osu! file: missing version header (got {!r})".format(line.rstrip()))
+        beatmap.version = int(match.group(1))
+        break
+
+    reader = None
+    for line in lines:
+        line = line.rstrip()
+        if not line:
+            continue
+
+        # See if we're changing the current reading section
+        if line[0] == "[" and line[-1] == "]":
+            reader = _SECTION_READERS.get(line[1:-1])
+        elif reader is not None:
+            reader(beatmap, line)
+
+
+def _scan_section_buffer(buffer, position=0):
+    """
+    Find where each section of an osu! file starts and ends, without decoding it.
+     :param buffer: The raw file contents: bytes, or a memory map.
+     :param position: Where to start looking, at the start of a line. Usually right after the version line.
+     :return: A dictionary from section name to its (start, end) byte range, header excluded.
+    """
+    sections = {}
+    current_section = None
+    start = position
+    size = len(buffer)
 
-    def read_hitobject(output_list, line):
-        output_list.append(HitObject.from_string(line))
+    def next_candidate(index):
+        # Only lines starting with a bracket can be headers, so skip straight to those.
+        index = buffer.find(b"\n[", index)
+        return -1 if index < 0 else index + 1
 
-    def read_sections(file):
-        current_section = "version"
-        for line in file:
-            line = line.rstrip()
-            # Read the version.
-            if current_section == "version":
-                match = re.match("osu file format v(\d+)", line)
-                output.version = int(match.group(1))
-                current_section = "null"
-                continue
-
-            # See if we're changing the current reading section
-            section_match = re.match(r'^\[(.*)\]$', line)
-            if section_match is not None:  # Yes, we are
-                current_section = section_match.group(1)
-                section_dict[current_section] = []
-                continue
-            elif current_section != "null":  # No, we are not
-                line = line.rstrip()
-                if len(line) > 0:
-                    section_dict[current_section].append(line)
-
-    def load_sections():
-        for section in section_dict:
-            for line in section_dict[section]:
-                if section == "TimingPoints":
-                    read_timing(output, line)
-                elif section == "General":
-                    read_attributes(output.general, line)
-                elif section == "Metadata":
-                    read_attributes(output.metadata, line)
-                elif section == "Difficulty":
-                    read_attributes(output.difficulty, line)
-                elif section == "Colours" or section == "Colors":
-                    read_color(output.colors, line)
-                elif section == "HitObjects":
-                    read_hitobject(output.objects, line)
-                elif section == "Editor":
-                    read_attributes(output.editor, line)
-                elif section == "Events":
-                    read_event(output.events, output.sb_samples, line)
-
-    with open(filename) as in_file:
-        # Read all sections.
-        read_sections(in_file)
-        load_sections()
+    line_start = position if buffer[position:position + 1] == b"[" else next_candidate(position)
+    while line_start >= 0:
+        line_end = buffer.find(b"\n", line_start)
+        if line_end < 0:
+            line_end = size
 
-    return output
+        stripped = buffer[line_start:line_end].rstrip()
+        if stripped[-1:] == b"]":
+            if current_section is not None:
+                sections[current_section] = (start, line_start)
 
+            current_section = stripped[1:-1].decode("utf-8")
+            start = min(line_end + 1, size)
 
-def write_to_file(beatmap, file_output):
-    def write_attributes(area):
-        for key in area.__dict__.keys():
-            value = getattr(area, key)
-            file_output.write("{}:{}\n".format(key, value))
+        line_start = next_candidate(line_end)
 
-    file_output.write("osu file format v{}\n\n".format(beatmap.version))
+    if current_section is not None:
+        sections[current_section] = (start, size)
+
+    return sections
 
-    file_output.write("[General]\n")
-    write_attributes(beatmap.general)
 
-    file_output.write("\n[Editor]\n")
-    write_attributes(beatmap.editor)
+def _scan_sections(in_file):
+    """
+    Find where each section of a binary osu! file starts and ends, without decoding it.
+     :param in_file: File opened in binary mode, positioned after the version line.
+     :return: A dictionary from section name to its (start, end) byte range, header excluded.
+    """
+    position = in_file.tell()
+    if os.fstat(in_file.fileno()).st_size <= position:
+        return {}
+
+    with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return _scan_section_buffer(buffer, position)
+
+
+def _file_stamp(filename):
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _open_lazy(beatmap, filename):
+    beatmap._source_stamp = _file_stamp(filename)
+    with open(filename, "rb") as in_file:
+        version_line = in_file.readline().decode("utf-8")
+        match = _VERSION_REGEX.search(version_line)
+        if match is None:
+            raise ValueError("Not a osu! file: missing version header (got {!r})".format(version_line.rstrip()))
+
+        beatmap.version = int(match.group(1))
+        beatmap._source_filename = filename
+        beatmap._section_ranges = {
+            section: byte_range
+            for section, byte_range in _scan_sections(in_file).items()
+            if section in _SECTION_READERS
+        }
+        beatmap._pending_sections = dict(beatmap._section_ranges)
+
+
+def read_from_file(filename, lazy=False, columnar=False):
+    """
+    Read a osu! beatmap from a osufile.
+     :param filename: Path of the file to read from, or an already open text stream.
+     :param lazy: Only locate the sections now, and parse each of them the first time
+      the beatmap attributes filled from it are accessed. Requires a path, and the file
+      must not change while sections are still pending.
+     :param columnar: Store the hitobjects in a HitObjectTable and the timing points in a TimingPointTable,
+      instead of lists of HitObjects and TimingPoints.
+     :return: The beatmap object
+    """
+    output = Beatmap()
+    if columnar:
+        output.objects = HitObjectTable()
+        output.timing_points = TimingPointTable()
+
+    if lazy:
+        if hasattr(filename, "read"):
+            raise ValueError("Lazy loading requires a file path, not a stream.")
+        _open_lazy(output, filename)
+    elif hasattr(filename, "read"):
+        _read_stream(output, filename)
+    else:
+        with open(filename, encoding="utf-8") as in_file:
+            _read_stream(output, in_file)
+
+    if columnar and not lazy:
+        output.objects.modified = False
+        output.timing_points.modified = False
+
+    return output
+
 
-    file_output.write("\n[Metadata]\n")
-    write_attributes(beatmap.metadata)
+def _attribute_lines(area):
+    return ("{}:{}".format(key, value) for key, value in area.__dict__.items())
 
-    file_output.write("\n[Difficulty]\n")
-    write_attributes(beatmap.difficulty)
 
-    file_output.write("\n[Events]\n")
-    file_output.writelines(x + "\n" for x in beatmap.events)
-    gen = []
-    for x in sorted(beatmap.sb_samples, key=lambda x: x[0]):
+def _sample_lines(samples):
+    # The table is always sorted by time.
+    for x in samples:
         fn = x[2].strip("\"")
 
         if len(x) > 3:
             vol = x[3]
         else:
             vol = 100
-        gen.append("{:.0f},{},\"{}\",{}\n".format(x[0], x[1], fn, vol))
+        yield "Sample,{:.0f},{},\"{}\",{}".format(x[0], x[1], fn, vol)
+
+
+def _event_lines(beatmap):
+    yield from beatmap.events
+    yield from _sample_lines(beatmap.sb_samples)
+
 
-    file_output.writelines("Sample," + x for x in gen)
+def _color_lines(colors):
+    for index in sorted(colors):
+        color = colors[index]
+        yield "Combo{} : {},{},{}".format(index, color.Red, color.Green, color.Blue)
 
-    file_output.write("\n[TimingPoints]\n")
-    file_output.writelines(str(x) + "\n" for x in beatmap.timing_points)
 
-    file_output.write("\n[HitObjects]\n")
-    file_output.writelines(str(x) + "\n" for x in beatmap.objects)
+def _row_lines(rows):
+    if isinstance(rows, (HitObjectTable, TimingPointTable)):
+        return rows.iter_strings()
+    return (str(x) for x in rows)
+
+
+def write_to_file(beatmap, file_output):
+    """
+    Write a beatmap in the .osu format.
+    Sections of a lazily read beatmap that were never parsed, or that were parsed
+    into a table that hasn't been modified since, are copied from the source file without re-serializing them.
+    When writing to a path, the beatmap is written to a temporary file that then replaces it,
+    so a lazily read beatmap can be written over its own source file; it is fully parsed first in that case.
+     :param beatmap: The beatmap to write.
+     :param file_output: Path of the file to write to, or an open text stream.
+    """
+    if not hasattr(file_output, "write"):
+        overwrites_source = (beatmap._source_filename is not None and os.path.exists(file_output)
+                             and os.path.samefile(file_output, beatmap._source_filename))
+        if overwrites_source:
+            beatmap.load_all_sections()
+
+        fd, temp_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_output)),
+                                         prefix=".", suffix=".osu.tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", buffering=1 << 16) as out:
+                write_to_file(beatmap, out)
+            if os.path.exists(file_output):
+                shutil.copymode(file_output, temp_name)
+            else:
+                os.chmod(temp_name, 0o666 & ~_umask())
+            os.replace(temp_name, file_output)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+        if overwrites_source:
+            # Everything is parsed and the old byte ranges no longer match the file.
+            beatmap._source_filename = None
+            beatmap._source_stamp = None
+            beatmap._section_ranges = {}
+            beatmap._loaded_tables = {}
+        return
+
+    def write_section(header, section, lines):
+        file_output.write(header)
+        raw = beatmap._get_unmodified_section(section)
+        if raw is not None:
+            raw = raw.rstrip()
+            file_output.write(raw + "\n" if raw else "")
+        else:
+            write_lines(file_output, lines())
+
+    file_output.write("osu file format v{}\n\n".format(beatmap.version))
+
+    write_section("[General]\n", "General", lambda: _attribute_lines(beatmap.general))
+    write_section("\n[Editor]\n", "Editor", lambda: _attribute_lines(beatmap.editor))
+    write_section("\n[Metadata]\n", "Metadata", lambda: _attribute_lines(beatmap.metadata))
+    write_section("\n[Difficulty]\n", "Difficulty", lambda: _attribute_lines(beatmap.difficulty))
+    write_section("\n[Events]\n", "Events", lambda: _event_lines(beatmap))
+    write_section("\n[TimingPoints]\n", "TimingPoints", lambda: _row_lines(beatmap.timing_points))
+
+    colours_section = "Colours" if "Colours" in beatmap._section_ranges else "Colors"
+    if beatmap._get_unmodified_section(colours_section) is not None or beatmap.colors:
+        write_section("\n[Colours]\n", colours_section, lambda: _color_lines(beatmap.colors))
+
+    write_section("\n[HitObjects]\n", "HitObjects", lambda: _row_lines(beatmap.objects))
 
     file_output.flush()
 
 
-def replace_timing_section(in_filename, out_filename, tp):
-    timing = read_from_file(in_filename).get_uninherited_points() + tp
-    timing_str = "\n".join(str(x) for x in sorted(timing, key=lambda x: x.time))
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def _copy_range(in_file, out_file, start, end, chunk_size=1 << 20):
+    in_file.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = in_file.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        out_file.write(chunk)
+        remaining -= len(chunk)
 
-    with open(in_filename) as in_file:
-        text = in_file.read()
-        s = "[TimingPoints]\n{}\n[".format(timing_str)
-        out_text = re.sub(r"\[timingpoints\](.+?)\[", s, text, flags=re.I)
-        # print(text, out_text)
 
-    with open(out_filename, "w") as out_file:
-        out_file.write(out_text)
+class SectionPatcher(object):
+    """
+    Rewrites whole sections of a .osu file without parsing it, leaving every other byte as it was.
+    Sections are located once, and their positions are kept up to date as they are rewritten,
+    so patching the same file repeatedly doesn't rescan it.
+    Every patch is written to a temporary file next to the target, then swapped in with os.replace.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._stamp = None
+        self._ranges = {}
+        self._newline = "\n"
+        self._scan()
+
+    def _scan(self):
+        self._stamp = _file_stamp(self.filename)
+        with open(self.filename, "rb") as in_file:
+            first_line = in_file.readline()
+            self._newline = "\r\n" if first_line.endswith(b"\r\n") else "\n"
+            self._ranges = _scan_sections(in_file)
+
+    def _refresh(self):
+        # Something other than this patcher wrote the file: the section positions are stale.
+        if _file_stamp(self.filename) != self._stamp:
+            self._scan()
+
+    @property
+    def sections(self):
+        """
+        :return: Names of the sections of the file, in the order they appear.
+        """
+        self._refresh()
+        return sorted(self._ranges, key=lambda section: self._ranges[section][0])
+
+    def read_section(self, section):
+        """
+        Read the text of a section.
+         :param section: Name of the section, such as "TimingPoints".
+         :return: The text of the section without its header, with "\\n" line terminators.
+        """
+        self._refresh()
+        start, end = self._ranges[section]
+        with open(self.filename, "rb") as in_file:
+            in_file.seek(start)
+            return in_file.read(end - start).decode("utf-8").replace("\r\n", "\n")
+
+    def _encode_section(self, content, is_last):
+        if isinstance(content, str):
+            lines = content.splitlines()
+        else:
+            lines = _row_lines(content)
+
+        text = self._newline.join(line for line in lines if line.strip())
+        text += self._newline
+        if not is_last:
+            text += self._newline
+        return text.encode("utf-8")
+
+    def patch(self, sections, out_filename=None):
+        """
+        Replace the contents of some sections. Sections the file doesn't have are added at its end.
+         :param sections: A dictionary from section name to its new contents: either the text of the
+          section, or an iterable of lines or objects such as a list of TimingPoints or a HitObjectTable.
+         :param out_filename: Where to write the result. By default, the patched file itself.
+          The patcher keeps working on its own file either way.
+        """
+        self._refresh()
+        target = self.filename if out_filename is None else out_filename
+        existing = sorted((section for section in sections if section in self._ranges),
+                          key=lambda section: self._ranges[section][0])
+        added = [section for section in sections if section not in self._ranges]
+        last_end = max((end for start, end in self._ranges.values()), default=None)
+
+        new_ranges = dict(self._ranges)
+        shift = 0
+        position = 0
+
+        fd, temp_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)),
+                                         prefix=".", suffix=".osu.tmp")
+        try:
+            with os.fdopen(fd, "wb") as out_file, open(self.filename, "rb") as in_file:
+                for section in existing:
+                    start, end = self._ranges[section]
+                    _copy_range(in_file, out_file, position, start)
+                    body = self._encode_section(sections[section], end == last_end and not added)
+                    out_file.write(body)
+                    position = end
+
+                    delta = len(body) - (end - start)
+                    new_ranges[section] = (start + shift, start + shift + len(body))
+                    for other, (other_start, other_end) in self._ranges.items():
+                        if other_start > start:
+                            new_ranges[other] = (new_ranges[other][0] + delta, new_ranges[other][1] + delta)
+                    shift += delta
+
+                in_file.seek(0, os.SEEK_END)
+                _copy_range(in_file, out_file, position, in_file.tell())
+
+                if added:
+                    in_file.seek(-1, os.SEEK_END)
+                    if in_file.read(1) not in b"\r\n":
+                        out_file.write(self._newline.encode("utf-8"))
+
+                for index, section in enumerate(added):
+                    header = "{0}[{1}]{0}".format(self._newline, section).encode("utf-8")
+                    out_file.write(header + self._encode_section(sections[section], index == len(added) - 1))
+
+            shutil.copymode(target if os.path.exists(target) else self.filename, temp_name)
+            os.replace(temp_name, target)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+        if out_filename is None:
+            if added:
+                # Adding sections moves the end of the previous last one; rare enough to just rescan.
+                self._scan()
+            else:
+                self._ranges = new_ranges
+                self._stamp = _file_stamp(self.filename)
+
+
+def replace_timing_section(in_filename, out_filename, tp):
+    """
+    Replace the inherited timing points of a map, keeping its uninherited ones.
+    Only the [TimingPoints] section is read and rewritten, see SectionPatcher.
+     :param in_filename: Map to read.
+     :param out_filename: Where to write the result. May be the same as in_filename.
+     :param tp: The new inherited timing points.
+    """
+    patcher = SectionPatcher(in_filename)
+    # A map without the section gets one.
+    text = patcher.read_section("TimingPoints") if "TimingPoints" in patcher.sections else ""
+    current = TimingPointTable.from_string(text)
+    timing = [x for x in current.to_objects() if x.uninherited] + list(tp)
+    timing.sort(key=lambda x: x.time)
+
+    out_filename = None if os.path.abspath(out_filename) == os.path.abspath(in_filename) else out_filename
+    patcher.patch({"TimingPoints": timing}, out_filename)
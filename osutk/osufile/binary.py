@@ -0,0 +1,282 @@
+"""
+A compact binary form of a Beatmap, for passing parsed maps around without going through the text format.
+
+All values are little-endian. A file is laid out as follows:
+
+Header, struct "<4sHH9I":
+    magic b"OSUB", format version (FORMAT_VERSION), osu! file format version,
+    then the counts of: strings, attributes, events, storyboard samples, colours,
+    hitobjects, timing points, sliders and slider points.
+
+String table, one entry per string: u32 byte length, then that many UTF-8 bytes.
+Every string below is a u32 index into this table; NO_STRING (0xFFFFFFFF) stands for a missing value.
+
+Attributes, struct "<BII" each: area (0 General, 1 Editor, 2 Metadata, 3 Difficulty), key, value.
+
+Events, struct "<I" each: the line.
+
+Storyboard samples, struct "<dIII" each: time, layer, filename, volume.
+
+Colours, struct "<Iiii" each: combo number, red, green, blue.
+
+Hitobjects, struct "<iidiiiiiidI" each: x, y, time, type, hitsound, sample set, addition set, custom set,
+volume, end time (equal to time except for holds and spinners), custom sample filename.
+
+Timing points, struct "<dddbidbb" each: time, value, beats per measure, sample set kind
+(index of SampleSet.set_kinds), custom set, volume, uninherited, kiai.
+
+Sliders, struct "<IIidIII" each: hitobject row, curve type, repeat, pixel length, edge hitsounds,
+edge additions, number of points. The edge values are stored as strings, as they may be pipe separated lists.
+
+Slider points, struct "<dd" each: x, y. The points of all sliders, in the order of the slider records.
+
+Loading gives the same beatmap as read_from_file(columnar=True): attribute values and storyboard sample fields
+come back as strings, and write_to_file output is identical before and after a round trip.
+"""
+import struct
+from array import array
+
+from osutk.objects.hitobject_table import HitObjectTable
+from osutk.objects.timing_point_table import TimingPointTable
+from .beatmap import Beatmap, Color
+
+__author__ = 'Agka'
+
+MAGIC = b"OSUB"
+FORMAT_VERSION = 1
+NO_STRING = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<4sHH9I")
+_LENGTH = struct.Struct("<I")
+_ATTRIBUTE = struct.Struct("<BII")
+_EVENT = struct.Struct("<I")
+_SB_SAMPLE = struct.Struct("<dIII")
+_COLOR = struct.Struct("<Iiii")
+_HITOBJECT = struct.Struct("<iidiiiiiidI")
+_TIMING_POINT = struct.Struct("<dddbidbb")
+_SLIDER = struct.Struct("<IIidIII")
+_POINT = struct.Struct("<dd")
+
+_AREAS = ("general", "editor", "metadata", "difficulty")
+_HITOBJECT_COLUMNS = ("x", "y", "time", "type", "hitsound", "sample_set", "addition_set", "custom_set", "volume",
+                      "end_time")
+_TIMING_POINT_COLUMNS = ("time", "value", "beats_per_measure", "sample_kind", "custom_set", "volume", "uninherited",
+                         "kiai")
+
+
+class _StringTable(object):
+    def __init__(self):
+        self.strings = []
+        self._indices = {}
+
+    def index(self, value):
+        if value is None:
+            return NO_STRING
+
+        value = str(value)
+        index = self._indices.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self._indices[value] = index
+        return index
+
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def _edge_value(value):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _as_columnar(beatmap):
+    objects = beatmap.objects
+    if not isinstance(objects, HitObjectTable):
+        objects = HitObjectTable(objects)
+
+    timing_points = beatmap.timing_points
+    if not isinstance(timing_points, TimingPointTable):
+        timing_points = TimingPointTable(timing_points)
+
+    return objects, timing_points
+
+
+def dumps(beatmap):
+    """
+    Serialize a beatmap to the binary format.
+     :param beatmap: The beatmap. Its objects and timing points may be lists or columnar tables.
+     :return: The serialized bytes.
+    """
+    strings = _StringTable()
+    objects, timing_points = _as_columnar(beatmap)
+
+    attributes = [_ATTRIBUTE.pack(area_index, strings.index(key), strings.index(value))
+                  for area_index, name in enumerate(_AREAS)
+                  for key, value in vars(getattr(beatmap, name)).items()]
+
+    events = [_EVENT.pack(strings.index(line)) for line in beatmap.events]
+
+    sb_samples = [_SB_SAMPLE.pack(float(sample[0]), strings.index(sample[1]), strings.index(sample[2]),
+                                  strings.index(sample[3] if len(sample) > 3 else None))
+                  for sample in beatmap.sb_samples]
+
+    colors = [_COLOR.pack(index, int(color.Red), int(color.Green), int(color.Blue))
+              for index, color in sorted(beatmap.colors.items())]
+
+    sample_indices = [strings.index(sample) for sample in objects.samples]
+    hitobjects = [_HITOBJECT.pack(*row, sample_indices[sample])
+                  for *row, sample in zip(*(getattr(objects, name) for name in _HITOBJECT_COLUMNS),
+                                          objects.custom_sample)]
+
+    timings = [_TIMING_POINT.pack(*row)
+               for row in zip(*(getattr(timing_points, name) for name in _TIMING_POINT_COLUMNS))]
+
+    sliders = []
+    points = []
+    for row in sorted(objects.slider_data):
+        data = objects.slider_data[row]
+        sliders.append(_SLIDER.pack(row, strings.index(data["curve_type"]), int(data["repeat"]),
+                                    float(data["pixel_length"]), strings.index(data["edge_hitsound"]),
+                                    strings.index(data["edge_addition"]), len(data["points"])))
+        points.extend(_POINT.pack(float(point["x"]), float(point["y"])) for point in data["points"])
+
+    encoded = [x.encode("utf-8") for x in strings.strings]
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, beatmap.version, len(encoded), len(attributes), len(events),
+                          len(sb_samples), len(colors), len(hitobjects), len(timings), len(sliders), len(points))
+
+    chunks = [header]
+    for string in encoded:
+        chunks.append(_LENGTH.pack(len(string)))
+        chunks.append(string)
+
+    for records in (attributes, events, sb_samples, colors, hitobjects, timings, sliders, points):
+        chunks.extend(records)
+
+    return b"".join(chunks)
+
+
+def loads(data):
+    """
+    Deserialize a beatmap from the binary format.
+     :param data: The serialized bytes.
+     :return: The beatmap, with a HitObjectTable and a TimingPointTable.
+    """
+    data = memoryview(data)
+    if len(data) < _HEADER.size:
+        raise ValueError("Not a binary beatmap: too short.")
+
+    magic, format_version, version, *counts = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary beatmap: bad magic {!r}.".format(magic))
+    if format_version != FORMAT_VERSION:
+        raise ValueError("Unsupported binary beatmap format version {}.".format(format_version))
+
+    (string_count, attribute_count, event_count, sb_sample_count, color_count,
+     hitobject_count, timing_point_count, slider_count, point_count) = counts
+    position = _HEADER.size
+
+    strings = []
+    for _ in range(string_count):
+        length, = _LENGTH.unpack_from(data, position)
+        position += _LENGTH.size
+        strings.append(str(data[position:position + length], "utf-8"))
+        position += length
+
+    def string(index):
+        return None if index == NO_STRING else strings[index]
+
+    def records(record, count):
+        nonlocal position
+        end = position + record.size * count
+        if end > len(data):
+            raise ValueError("Truncated binary beatmap.")
+        unpacked = record.iter_unpack(data[position:end])
+        position = end
+        return unpacked
+
+    beatmap = Beatmap()
+    beatmap.version = version
+
+    areas = [lambda: None for _ in _AREAS]
+    for area, key, value in records(_ATTRIBUTE, attribute_count):
+        setattr(areas[area], strings[key], strings[value])
+    for name, area in zip(_AREAS, areas):
+        setattr(beatmap, name, area)
+
+    beatmap.events = [strings[line] for line, in records(_EVENT, event_count)]
+
+    sb_samples = []
+    for time, layer, filename, volume in records(_SB_SAMPLE, sb_sample_count):
+        sample = (_number(time), string(layer), string(filename))
+        sb_samples.append(sample if volume == NO_STRING else sample + (strings[volume],))
+    beatmap.sb_samples = sb_samples
+
+    beatmap.colors = {index: Color(red, green, blue) for index, red, green, blue in records(_COLOR, color_count)}
+
+    objects = HitObjectTable()
+    rows = list(records(_HITOBJECT, hitobject_count))
+    if rows:
+        # Transpose the records into columns in one go.
+        columns = list(zip(*rows))
+        for name, column in zip(_HITOBJECT_COLUMNS, columns):
+            setattr(objects, name, array(getattr(objects, name).typecode, column))
+
+        sample_indices = {index: objects.intern_sample(strings[index]) for index in dict.fromkeys(columns[-1])}
+        objects.custom_sample = array(objects.custom_sample.typecode, map(sample_indices.__getitem__, columns[-1]))
+
+    timing_points = TimingPointTable()
+    rows = list(records(_TIMING_POINT, timing_point_count))
+    if rows:
+        for name, column in zip(_TIMING_POINT_COLUMNS, zip(*rows)):
+            setattr(timing_points, name, array(getattr(timing_points, name).typecode, column))
+
+    sliders = list(records(_SLIDER, slider_count))
+    point_records = records(_POINT, point_count)
+    for row, curve_type, repeat, pixel_length, edge_hitsound, edge_addition, slider_point_count in sliders:
+        objects.slider_data[row] = {
+            "curve_type": strings[curve_type],
+            "repeat": repeat,
+            "points": [{"x": _number(x), "y": _number(y)}
+                       for x, y in (next(point_records) for _ in range(slider_point_count))],
+            "pixel_length": pixel_length,
+            "edge_hitsound": _edge_value(strings[edge_hitsound]),
+            "edge_addition": _edge_value(strings[edge_addition]),
+        }
+
+    objects.modified = False
+    timing_points.modified = False
+    beatmap.objects = objects
+    beatmap.timing_points = timing_points
+    return beatmap
+
+
+def save(beatmap, file_output):
+    """
+    Write a beatmap in the binary format.
+     :param beatmap: The beatmap.
+     :param file_output: Path of the file to write to, or a stream opened in binary mode.
+    """
+    data = dumps(beatmap)
+    if hasattr(file_output, "write"):
+        file_output.write(data)
+    else:
+        with open(file_output, "wb") as out_file:
+            out_file.write(data)
+
+
+def load(file_input):
+    """
+    Read a beatmap written by save.
+     :param file_input: Path of the file to read from, or a stream opened in binary mode.
+     :return: The beatmap, with a HitObjectTable and a TimingPointTable.
+    """
+    if hasattr(file_input, "read"):
+        return loads(file_input.read())
+
+    with open(file_input, "rb") as in_file:
+        return loads(in_file.read())
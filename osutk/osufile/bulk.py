@@ -0,0 +1,120 @@
+import mmap
+import os
+from collections import namedtuple
+
+from osutk.objects.hitobject_table import HitObjectTable
+from osutk.objects.timing_point_table import TimingPointTable
+from .beatmap import Beatmap, _SECTION_READERS, _VERSION_REGEX, _file_stamp, _scan_section_buffer
+
+__author__ = 'Agka'
+
+BeatmapInfo = namedtuple("BeatmapInfo", "path version general metadata difficulty")
+""" The metadata-only view of a beatmap yielded by iter_metadata. """
+
+METADATA_SECTIONS = ("General", "Metadata", "Difficulty")
+
+
+def find_beatmaps(root):
+    """
+    Walk a directory tree for .osu files, in a stable order.
+     :param root: Directory to search, such as an osu! Songs folder.
+     :return: An iterator of file paths.
+    """
+    for directory, directories, files in os.walk(root):
+        directories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".osu"):
+                yield os.path.join(directory, name)
+
+
+def load_beatmap(filename, sections=None, columnar=False):
+    """
+    Read a beatmap through a memory map, decoding only the requested sections.
+    Other sections are left pending like with read_from_file(lazy=True),
+    and parsed from the file the first time they're accessed.
+     :param filename: Path of the .osu file.
+     :param sections: Names of the sections to parse now, or None for all of them.
+     :param columnar: Store the hitobjects and timing points in a HitObjectTable and a TimingPointTable.
+     :return: The beatmap.
+    """
+    beatmap = Beatmap()
+    if columnar:
+        beatmap.objects = HitObjectTable()
+        beatmap.timing_points = TimingPointTable()
+
+    with open(filename, "rb") as in_file:
+        stamp = _file_stamp(filename)
+        if stamp[1] == 0:
+            raise ValueError("Not a osu! file: {} is empty".format(filename))
+
+        with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            version_end = buffer.find(b"\n")
+            version_end = len(buffer) if version_end < 0 else version_end + 1
+            version_line = buffer[:version_end].decode("utf-8", "replace")
+            match = _VERSION_REGEX.search(version_line)
+            if match is None:
+                raise ValueError("Not a osu! file: missing version header (got {!r})".format(version_line.rstrip()))
+
+            beatmap.version = int(match.group(1))
+            ranges = {
+                section: byte_range
+                for section, byte_range in _scan_section_buffer(buffer, version_end).items()
+                if section in _SECTION_READERS
+            }
+
+            beatmap._source_filename = filename
+            beatmap._source_stamp = stamp
+            beatmap._section_ranges = ranges
+            beatmap._pending_sections = dict(ranges)
+
+            for section in ranges if sections is None else sections:
+                byte_range = beatmap._pending_sections.pop(section, None)
+                if byte_range is not None:
+                    start, end = byte_range
+                    beatmap._parse_section(section, buffer[start:end].decode("utf-8"))
+
+    return beatmap
+
+
+def _iter_loaded(paths, load, on_error):
+    for path in paths:
+        try:
+            loaded = load(path)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            if on_error is None:
+                raise
+            on_error(path, e)
+            continue
+        yield loaded
+
+
+def iter_beatmaps(root, sections=None, columnar=False, on_error=None):
+    """
+    Load every .osu file under a directory, one at a time, with load_beatmap.
+     :param root: Directory to search.
+     :param sections: Names of the sections to parse right away, or None for all of them.
+     :param columnar: Store the hitobjects and timing points in columnar tables.
+     :param on_error: Called with the path and the exception for files that can't be read,
+      which are then skipped. By default, the exception is raised.
+     :return: An iterator of (path, Beatmap) pairs.
+    """
+    return _iter_loaded(find_beatmaps(root),
+                        lambda path: (path, load_beatmap(path, sections, columnar)),
+                        on_error)
+
+
+def _load_info(path):
+    beatmap = load_beatmap(path, METADATA_SECTIONS)
+    return BeatmapInfo(path, beatmap.version, beatmap.general, beatmap.metadata, beatmap.difficulty)
+
+
+def iter_metadata(root, on_error=None):
+    """
+    Read the [General], [Metadata] and [Difficulty] sections of every .osu file under a directory.
+    Nothing else is decoded and the beatmaps aren't kept, so this is the cheapest way to index a Songs folder.
+     :param root: Directory to search.
+     :param on_error: Called with the path and the exception for files that can't be read,
+      which are then skipped. By default, the exception is raised.
+     :return: An iterator of BeatmapInfo records.
+    """
+    return _iter_loaded(find_beatmaps(root), _load_info, on_error)
@@ -0,0 +1,233 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from array import array
+
+from osutk.objects.hitobject_table import HitObjectTable
+from osutk.objects.timing_point_table import TimingPointTable
+from .beatmap import Beatmap, Color, read_from_file
+
+__author__ = 'Agka'
+
+_CACHE_FORMAT = 1
+""" Bumped whenever the layout of cache entries changes, so older entries are ignored. """
+
+_OBJECT_COLUMNS = ("x", "y", "time", "type", "hitsound", "sample_set", "addition_set", "custom_set", "volume",
+                   "end_time", "custom_sample")
+_TIMING_COLUMNS = ("time", "value", "beats_per_measure", "sample_kind", "custom_set", "volume", "uninherited", "kiai")
+_AREAS = ("general", "editor", "metadata", "difficulty")
+
+
+def _file_hash(filename):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as in_file:
+        for chunk in iter(lambda: in_file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _columns(table, names):
+    return {name: getattr(table, name).tobytes() for name in names}
+
+
+def _restore_columns(table, names, columns):
+    for name in names:
+        column = array(getattr(table, name).typecode)
+        column.frombytes(columns[name])
+        setattr(table, name, column)
+
+
+def _to_compact(beatmap):
+    """
+    Reduce a beatmap read with columnar=True to plain containers: the table columns are kept as raw bytes.
+    """
+    objects = beatmap.objects
+    return {
+        "version": beatmap.version,
+        "areas": {name: dict(vars(getattr(beatmap, name))) for name in _AREAS},
+        "events": beatmap.events,
+        "sb_samples": list(beatmap.sb_samples),
+        "colors": {index: (x.Red, x.Green, x.Blue) for index, x in beatmap.colors.items()},
+        "objects": _columns(objects, _OBJECT_COLUMNS),
+        "samples": objects.samples,
+        "slider_data": objects.slider_data,
+        "timing_points": _columns(beatmap.timing_points, _TIMING_COLUMNS),
+    }
+
+
+def _from_compact(data):
+    beatmap = Beatmap()
+    beatmap.version = data["version"]
+
+    for name in _AREAS:
+        area = lambda: None
+        area.__dict__.update(data["areas"][name])
+        setattr(beatmap, name, area)
+
+    beatmap.events = data["events"]
+    beatmap.sb_samples = data["sb_samples"]
+    beatmap.colors = {index: Color(*rgb) for index, rgb in data["colors"].items()}
+
+    objects = HitObjectTable()
+    _restore_columns(objects, _OBJECT_COLUMNS, data["objects"])
+    objects.samples = data["samples"]
+    objects._sample_indices = {sample: index for index, sample in enumerate(objects.samples)}
+    objects.slider_data = data["slider_data"]
+    objects.modified = False
+    beatmap.objects = objects
+
+    timing_points = TimingPointTable()
+    _restore_columns(timing_points, _TIMING_COLUMNS, data["timing_points"])
+    timing_points.modified = False
+    beatmap.timing_points = timing_points
+
+    return beatmap
+
+
+class BeatmapCache(object):
+    """
+    An on-disk cache of parsed beatmaps, so unchanged files are never parsed twice across runs.
+    Entries are keyed by the path of the .osu file, and hold its modification time, size and content hash.
+    A file whose modification time and size are unchanged is trusted as is; otherwise its contents are hashed,
+    and only if the hash changed is it parsed again.
+    When the entries outgrow max_size bytes, the least recently used ones are removed.
+    """
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._total_size = None
+        """ Running size of the entries, in bytes; None until the directory is first scanned. """
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, filename):
+        key = hashlib.blake2b(os.path.abspath(filename).encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.directory, key + ".bmc")
+
+    def _read_entry(self, entry_path):
+        try:
+            with open(entry_path, "rb") as entry_file:
+                entry = pickle.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError):
+            # A damaged or foreign file: it will be overwritten.
+            return None
+
+        if not isinstance(entry, dict) or entry.get("format") != _CACHE_FORMAT:
+            return None
+        return entry
+
+    def _write_entry(self, entry_path, entry):
+        try:
+            old_size = os.stat(entry_path).st_size
+        except FileNotFoundError:
+            old_size = 0
+
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as entry_file:
+                pickle.dump(entry, entry_file, pickle.HIGHEST_PROTOCOL)
+            size = os.stat(temp_name).st_size
+            os.replace(temp_name, entry_path)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+        if self._total_size is not None:
+            self._total_size += size - old_size
+
+    def read(self, filename):
+        """
+        Read a beatmap through the cache. The result is the same as read_from_file(filename, columnar=True).
+         :param filename: Path of the .osu file.
+         :return: The beatmap. It's a fresh copy every time, so it can be modified freely.
+        """
+        stat = os.stat(filename)
+        entry_path = self._entry_path(filename)
+        entry = self._read_entry(entry_path)
+
+        if entry is not None and entry["path"] == os.path.abspath(filename):
+            fresh = entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+            if not fresh and entry["hash"] == _file_hash(filename):
+                # Touched or copied over, but the contents are the same.
+                entry["mtime_ns"] = stat.st_mtime_ns
+                entry["size"] = stat.st_size
+                self._write_entry(entry_path, entry)
+                fresh = True
+
+            if fresh:
+                self.hits += 1
+                os.utime(entry_path)
+                return _from_compact(entry["beatmap"])
+
+        self.misses += 1
+        content_hash = _file_hash(filename)
+        beatmap = read_from_file(filename, columnar=True)
+        self._write_entry(entry_path, {
+            "format": _CACHE_FORMAT,
+            "path": os.path.abspath(filename),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": content_hash,
+            "beatmap": _to_compact(beatmap),
+        })
+        if self._total_size is None:
+            self.total_size()
+        if self._total_size > self.max_size:
+            self.evict()
+        return beatmap
+
+    def invalidate(self, filename):
+        """
+        Remove the entry of a file, if there is one.
+         :param filename: Path of the .osu file.
+        """
+        entry_path = self._entry_path(filename)
+        try:
+            size = os.stat(entry_path).st_size
+            os.remove(entry_path)
+        except FileNotFoundError:
+            return
+
+        if self._total_size is not None:
+            self._total_size -= size
+
+    def _entries(self):
+        with os.scandir(self.directory) as it:
+            return [x for x in it if x.name.endswith(".bmc") and x.is_file()]
+
+    def total_size(self):
+        """
+        :return: The size of all entries, in bytes.
+        """
+        self._total_size = sum(x.stat().st_size for x in self._entries())
+        return self._total_size
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in max_size.
+        """
+        entries = [(x.stat().st_mtime_ns, x.stat().st_size, x.path) for x in self._entries()]
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total_size = total
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        for entry in self._entries():
+            os.remove(entry.path)
+        self._total_size = 0
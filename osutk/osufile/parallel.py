@@ -0,0 +1,71 @@
+import multiprocessing
+import traceback
+from collections import namedtuple
+
+from .beatmap import read_from_file
+
+__author__ = 'Agka'
+
+MapResult = namedtuple("MapResult", "path value error")
+"""
+The outcome of running a function on one beatmap.
+value is what the function returned, and error is None; or if reading the file or running the function
+raised, value is None and error is the formatted exception.
+"""
+
+_worker_state = {}
+
+
+def _init_worker(func, lazy, columnar):
+    # The function is sent once per worker, not once per task.
+    _worker_state["func"] = func
+    _worker_state["options"] = (lazy, columnar)
+
+
+def _run_one(path, func, lazy, columnar):
+    try:
+        beatmap = read_from_file(path, lazy=lazy, columnar=columnar)
+        return MapResult(path, func(beatmap), None)
+    except Exception:
+        return MapResult(path, None, traceback.format_exc())
+
+
+def _run_in_worker(path):
+    return _run_one(path, _worker_state["func"], *_worker_state["options"])
+
+
+def map_beatmaps(paths, func, processes=None, chunksize=None, ordered=True, lazy=False, columnar=False):
+    """
+    Read many beatmaps and run a function on each, across a pool of processes.
+    Only what func returns is sent back from the workers, so it should return compact data
+    (numbers, tuples, short lists) rather than the beatmap or its objects.
+     :param paths: Paths of the .osu files.
+     :param func: Function taking a Beatmap. Must be picklable: defined at module level, not a lambda.
+     :param processes: Number of worker processes. Defaults to the number of CPUs.
+      With a single process, everything runs in the current one.
+     :param chunksize: Number of paths handed to a worker at a time. By default, about four chunks per worker.
+     :param ordered: Yield results in the order of paths. Otherwise, yield them as they complete.
+     :param lazy: Passed to read_from_file.
+     :param columnar: Passed to read_from_file.
+     :return: An iterator of MapResult, one per path.
+    """
+    paths = list(paths)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(paths)))
+
+    if processes == 1:
+        for path in paths:
+            yield _run_one(path, func, lazy, columnar)
+        return
+
+    if chunksize is None:
+        chunksize = max(1, len(paths) // (processes * 4))
+
+    with multiprocessing.Pool(processes, _init_worker, (func, lazy, columnar)) as pool:
+        if ordered:
+            results = pool.imap(_run_in_worker, paths, chunksize)
+        else:
+            results = pool.imap_unordered(_run_in_worker, paths, chunksize)
+
+        yield from results
@@ -1,3 +1,7 @@
+import multiprocessing
+from itertools import chain
+
+from osutk._io import write_lines
 from .constants import *
 
 __author__ = 'Agka'
@@ -9,6 +13,23 @@ def _fmt(val):
     return "{:.3f}".format(float(val)).rstrip("0").rstrip(".")
 
 
+_LAYER_HEADERS = (
+    (Layer.Background, "//Storyboard Layer 0 (Background)"),
+    (Layer.Fail, "//Storyboard Layer 1 (Fail)"),
+    (Layer.Pass, "//Storyboard Layer 2 (Pass)"),
+    (Layer.Foreground, "//Storyboard Layer 3 (Foreground)"),
+)
+
+_WRITE_BUFFER_SIZE = 1 << 20
+
+_PARALLEL_EXPORT_MIN_SPRITES = 16
+""" Below this many sprites, starting a process pool costs more than serializing them in this process. """
+
+
+def _serialize_sprite(sprite):
+    return "\n".join(sprite.lines())
+
+
 class Storyboard(object):
     """
     Singleton instance of storyboard.
@@ -28,36 +49,68 @@ class Storyboard(object):
         Storyboard._sprites.append(sprite)
 
     @staticmethod
-    def export(filename="output.osb"):
+    def lines(processes=1, chunksize=None):
+        """
+        Serialize the storyboard one line at a time, layer by layer.
+        Sprites are split by layer in a single pass and serialized only as the lines are consumed.
+         :param processes: Number of processes to serialize sprites in. None for the number of CPUs.
+          Sprites are serialized in this process if it's 1, or if there are only a few sprites.
+         :param chunksize: Number of sprites handed to a worker at a time. By default, about four chunks per worker.
+         :return: An iterator of lines, without line endings. The output is the same whatever the number of processes,
+          although with several, a sprite's lines come as a single string joined by line breaks.
+        """
+        sprites_by_layer = {layer: [] for layer, header in _LAYER_HEADERS}
+        for sprite in Storyboard._sprites:
+            sprites = sprites_by_layer.get(sprite.layer)
+            if sprites is not None:
+                sprites.append(sprite)
+
+        sprite_count = sum(len(x) for x in sprites_by_layer.values())
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if sprite_count < _PARALLEL_EXPORT_MIN_SPRITES:
+            processes = 1
+
+        yield "[Events]"
+        yield "//Background and Video events"
+        if processes <= 1:
+            for layer, header in _LAYER_HEADERS:
+                yield header
+                for sprite in sprites_by_layer[layer]:
+                    yield from sprite.lines()
+            return
+
+        if chunksize is None:
+            chunksize = max(1, sprite_count // (processes * 4))
+
+        with multiprocessing.Pool(processes) as pool:
+            # imap keeps the order of the sprites, so the output doesn't depend on which worker finishes first.
+            serialized = pool.imap(_serialize_sprite,
+                                   chain.from_iterable(sprites_by_layer[layer] for layer, header in _LAYER_HEADERS),
+                                   chunksize)
+            for layer, header in _LAYER_HEADERS:
+                yield header
+                for _ in sprites_by_layer[layer]:
+                    yield next(serialized)
+
+    @staticmethod
+    def export(filename="output.osb", processes=1, chunksize=None):
         """
         Export the storyboard to a file.
-         :param filename: File to export the storyboard to. By default it is 'output.osb'
+        The text is written as it's generated, so the whole storyboard never has to be held in memory as a string.
+         :param filename: File to export the storyboard to, or a stream opened in text mode.
+          By default it is 'output.osb'
+         :param processes: Number of processes to serialize sprites in, see Storyboard.lines.
+          Sprites must be picklable to use more than one.
+         :param chunksize: See Storyboard.lines.
         """
-        with open(filename, "w") as out:
-            background_sprites = list(filter(lambda obj: obj.layer == Layer.Background, Storyboard._sprites))
-            pass_sprites = list(filter(lambda obj: obj.layer == Layer.Pass, Storyboard._sprites))
-            fail_sprites = list(filter(lambda obj: obj.layer == Layer.Fail, Storyboard._sprites))
-            fg_sprites = list(filter(lambda obj: obj.layer == Layer.Foreground, Storyboard._sprites))
-
-            bg_out = "//Storyboard Layer 0 (Background)"
-            if len(background_sprites):
-                bg_out += "\n" + "\n".join(str(x) for x in background_sprites)
-
-            fail_out = "//Storyboard Layer 1 (Fail)"
-            if len(fail_sprites):
-                fail_out += "\n" + "\n".join(str(x) for x in fail_sprites)
+        lines = Storyboard.lines(processes, chunksize)
+        if hasattr(filename, "write"):
+            write_lines(filename, lines)
+            return
 
-            pass_out = "//Storyboard Layer 2 (Pass)"
-            if len(pass_sprites):
-                pass_out += "\n" + "\n".join(str(x) for x in pass_sprites)
-
-            fg_out = "//Storyboard Layer 3 (Foreground)"
-            if len(fg_sprites):
-                fg_out += "\n" + "\n".join(str(x) for x in fg_sprites)
-
-            output = "[Events]\n//Background and Video events\n" + "\n".join([bg_out, fail_out, pass_out, fg_out])
-            print(output, file=out)
-            pass
+        with open(filename, "w", buffering=_WRITE_BUFFER_SIZE) as out:
+            write_lines(out, lines)
 
 
 class SpriteEvent(object):
@@ -582,9 +635,25 @@ class CommandList(object):
         self.add_event(return_loop)
         return return_loop
 
+    def _sub_event_lines(self):
+        for event in join_events(self._events):
+            event_lines = event.lines() if isinstance(event, SpriteEventLoop) else str(event).split("\n")
+            for line in event_lines:
+                yield "_" + line
+
+    def _lines_after(self, header):
+        yield header
+        empty = True
+        for line in self._sub_event_lines():
+            empty = False
+            yield line
+
+        if empty:
+            # The header has always been followed by a line break, even with no events.
+            yield ""
+
     def join_sub_events(self):
-        events_joined = join_events(self._events)
-        return "\n".join(["\n".join(map(lambda x: "_" + x, str(x).split("\n"))) for x in events_joined])
+        return "\n".join(self._sub_event_lines())
         # return "\n".join(["\n".join(map(lambda x: "_" + x, str(x).split("\n"))) for x in self._events])
 
 
@@ -599,9 +668,11 @@ class SpriteEventLoop(CommandList):
         self.start_time = start_time
         self.loops = loops
 
+    def lines(self):
+        return self._lines_after("L,{},{}".format(self.start_time, self.loops))
+
     def __str__(self):
-        dic = {'st': self.start_time, "lc": self.loops}
-        return "L,{st},{lc}\n".format(**dic) + self.join_sub_events()
+        return "\n".join(self.lines())
 
     # Have a couple empty functions so we can allow the with sprite.loop() as l idiom
     def __enter__(self):
@@ -632,14 +703,16 @@ A sprite with only the raw osu! commands.
         self.layer = layer
         Storyboard.add_sprite(self)
 
-    def __str__(self):
+    def lines(self):
         dic = {'layer': self.layer,
                'origin': self.origin,
                'file': self.file,
                'sx': self.location[0],
                'sy': self.location[1]}
-        events = self.join_sub_events()
-        return 'Sprite,{layer},{origin},"{file}",{sx:.0f},{sy:.0f}\n'.format(**dic) + events
+        return self._lines_after('Sprite,{layer},{origin},"{file}",{sx:.0f},{sy:.0f}'.format(**dic))
+
+    def __str__(self):
+        return "\n".join(self.lines())
 
 class TemporalSprite(Sprite):
     def __init__(self, layer=Layer.Background, origin=Origin.TopLeft, file="", location=(0, 0)):
@@ -695,3 +768,6 @@ An audio sample to play.
                                                               layer=self.layer,
                                                               file=self.file,
                                                               volume=self.volume)
+
+    def lines(self):
+        yield str(self)
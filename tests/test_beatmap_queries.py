@@ -0,0 +1,173 @@
+import unittest
+
+import osutk.osufile.beatmap as bm
+from osutk.objects import HitCircle, Hold, TimingPoint
+
+__author__ = 'Agka'
+
+
+class TestObjectTimeIndex(unittest.TestCase):
+    def setUp(self):
+        self.beatmap = bm.read_from_file("maps/test1.osu")
+
+    def test_objects_at_time(self):
+        for t in (1708, 17054, 46477, 123):
+            expected = [x for x in self.beatmap.objects if x.time == t]
+            self.assertEqual(self.beatmap.get_objects_at_time(t), expected)
+            self.assertIs(self.beatmap.get_object_at_time(t), expected[0] if expected else None)
+
+    def test_objects_in_range(self):
+        expected = sorted((x for x in self.beatmap.objects if 1708 <= x.time < 17054), key=lambda x: x.time)
+        self.assertEqual(self.beatmap.get_objects_in_range(1708, 17054), expected)
+        self.assertEqual(self.beatmap.get_objects_in_range(10 ** 9, 10 ** 10), [])
+
+    def test_index_follows_changes(self):
+        self.assertIsNone(self.beatmap.get_object_at_time(5))
+
+        obj = HitCircle(64, 192, 5, 0)
+        self.beatmap.objects.append(obj)
+        self.assertIs(self.beatmap.get_object_at_time(5), obj)
+
+        self.beatmap.objects = [obj]
+        self.assertEqual(self.beatmap.get_distinct_times(), {5})
+
+        obj.time = 10
+        self.beatmap.invalidate_object_index()
+        self.assertEqual(self.beatmap.get_objects_at_time(10), [obj])
+
+
+    def test_in_place_replacement(self):
+        old = self.beatmap.objects[0]
+        self.beatmap.get_distinct_times()
+
+        new = HitCircle(64, 192, 5, 0)
+        self.beatmap.objects[0] = new
+        self.beatmap.invalidate_object_index()
+        self.assertEqual(self.beatmap.get_objects_at_time(5), [new])
+        self.assertNotIn(old, self.beatmap.get_objects_at_time(old.time))
+
+        last = HitCircle(64, 192, 7, 0)
+        self.beatmap.objects.pop()
+        self.beatmap.objects.append(last)
+        self.beatmap.invalidate_object_index()
+        self.assertEqual(self.beatmap.get_objects_at_time(7), [last])
+
+class TestLaneIndex(unittest.TestCase):
+    def setUp(self):
+        self.beatmap = bm.read_from_file("maps/test1.osu")
+
+    def test_matches_linear_scan(self):
+        for columnar in (False, True):
+            beatmap = bm.read_from_file("maps/test1.osu", columnar=columnar)
+            for lane in range(beatmap.lane_count + 1):
+                expected = sorted((x for x in beatmap.objects if beatmap.get_mania_lane(x) == lane),
+                                  key=lambda x: x.time)
+                self.assertEqual([x.time for x in beatmap.get_lane_objects(lane)], [x.time for x in expected])
+
+                start_times, end_times = beatmap.get_lane_times(lane)
+                self.assertEqual(list(start_times), [x.time for x in expected])
+                self.assertEqual(len(end_times), len(expected))
+
+    def test_end_times(self):
+        hold = Hold(64, 192, 100, 0)
+        hold.end_time = 400
+        self.beatmap.objects = [HitCircle(64, 192, 500, 0), hold, HitCircle(448, 192, 100, 0)]
+        self.beatmap.lane_count = 4
+
+        self.assertEqual(self.beatmap.get_lane_objects(0), [hold, self.beatmap.objects[0]])
+        self.assertEqual(tuple(map(list, self.beatmap.get_lane_times(0))), ([100, 500], [400, 500]))
+        self.assertEqual(list(self.beatmap.get_lane_times(3)[0]), [100])
+        self.assertEqual(list(self.beatmap.get_lane_times(1)[0]), [])
+
+    def test_index_follows_changes(self):
+        obj = HitCircle(200, 192, 5, 0)
+        self.beatmap.objects = [obj]
+        self.beatmap.lane_count = 4
+        self.assertEqual(self.beatmap.get_lane_objects(1), [obj])
+
+        self.beatmap.lane_count = 2
+        self.assertEqual(self.beatmap.get_lane_objects(0), [obj])
+
+        other = HitCircle(400, 192, 1, 0)
+        self.beatmap.objects.append(other)
+        self.assertEqual(self.beatmap.get_lane_objects(1), [other])
+
+        obj.x = 300
+        self.beatmap.invalidate_object_index()
+        self.assertEqual(self.beatmap.get_lane_objects(1), [other, obj])
+
+
+def linear_effective_timing_point(timing_points, time):
+    current = timing_points[0]
+    for tp in timing_points:
+        if time >= tp.time > current.time:
+            current = tp
+
+        if tp.time > time:
+            break
+
+    return current
+
+
+class TestTimingIndex(unittest.TestCase):
+    def setUp(self):
+        self.beatmap = bm.read_from_file("maps/test1.osu")
+        self.beatmap.sort_timing_points()
+        self.times = sorted({x.time for x in self.beatmap.timing_points} |
+                            {x.time + 1 for x in self.beatmap.timing_points} |
+                            {0, 10 ** 9} | self.beatmap.get_distinct_times())
+
+    def test_matches_linear_scan(self):
+        for t in self.times:
+            self.assertIs(self.beatmap.get_effective_timing_point(t),
+                          linear_effective_timing_point(self.beatmap.timing_points, t))
+
+    def test_batch(self):
+        self.assertEqual(self.beatmap.get_effective_timing_points(self.times),
+                         [self.beatmap.get_effective_timing_point(t) for t in self.times])
+
+    def test_first_declared_wins(self):
+        first = TimingPoint(time=100)
+        self.beatmap.timing_points = [TimingPoint(time=0), first, TimingPoint(time=100, uninherited=0)]
+        self.assertIs(self.beatmap.get_effective_timing_point(150), first)
+        self.assertEqual(self.beatmap.get_effective_timing_points([150]), [first])
+
+    def test_follows_changes(self):
+        late = TimingPoint(time=10 ** 8)
+        self.beatmap.timing_points.append(late)
+        self.assertIs(self.beatmap.get_effective_timing_point(10 ** 9), late)
+
+    def test_in_place_replacement(self):
+        self.beatmap.get_effective_timing_point(10 ** 9)
+        late = TimingPoint(time=10 ** 8)
+        self.beatmap.timing_points[-1] = late
+        self.beatmap.invalidate_timing_index()
+        self.assertIs(self.beatmap.get_effective_timing_point(10 ** 9), late)
+
+
+class TestResolveAllSounds(unittest.TestCase):
+    def setUp(self):
+        self.beatmap = bm.read_from_file("maps/test1.osu")
+
+    def test_matches_get_effective_sounds(self):
+        resolved = list(self.beatmap.resolve_all_sounds())
+        self.assertEqual(len(resolved), len(self.beatmap.objects))
+        self.assertEqual([x.time for x in resolved], sorted(x.time for x in self.beatmap.objects))
+
+        for record in resolved:
+            expected = self.beatmap.get_effective_sounds(record.obj)
+            self.assertEqual(record.sounds(), expected)
+            self.assertEqual([x.is_auto for x in record.sounds()], [x.is_auto for x in expected])
+            self.assertEqual(record.addition_set, self.beatmap.get_effective_addition_set(record.obj))
+            self.assertEqual(record.sample_set, self.beatmap.get_effective_sample_set(record.obj))
+
+    def test_custom_set(self):
+        obj = HitCircle(64, 192, 1708, 2)
+        obj.custom_set = 3
+        self.beatmap.objects = [obj]
+        self.assertEqual(next(self.beatmap.resolve_all_sounds()).custom_set, 3)
+        self.assertEqual(self.beatmap.get_effective_sounds(obj)[0].custom_set, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
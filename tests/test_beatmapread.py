@@ -0,0 +1,134 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import osutk.osufile.beatmap as bm
+
+__author__ = 'Agka'
+
+
+class TestBeatmapRead(unittest.TestCase):
+    def test_read_from_stream(self):
+        from_path = bm.read_from_file("maps/test1.osu")
+        with open("maps/test1.osu", encoding="utf-8") as f:
+            from_stream = bm.read_from_file(io.StringIO(f.read()))
+
+        self.assertEqual(from_stream.version, from_path.version)
+        self.assertEqual(from_stream.metadata.Title, from_path.metadata.Title)
+        self.assertEqual(len(from_stream.timing_points), len(from_path.timing_points))
+        self.assertEqual([x._tuple() for x in from_stream.objects], [x._tuple() for x in from_path.objects])
+
+    def test_unknown_sections_ignored(self):
+        text = "osu file format v14\n\n[Nonsense]\nfoo\n\n[Metadata]\nTitle:abc\n"
+        beatmap = bm.read_from_file(io.StringIO(text))
+        self.assertEqual(beatmap.version, 14)
+        self.assertEqual(beatmap.metadata.Title, "abc")
+
+    def test_missing_version(self):
+        self.assertRaises(ValueError, bm.read_from_file, io.StringIO("[Metadata]\nTitle:abc\n"))
+
+    def test_lazy_sections(self):
+        beatmap = bm.read_from_file("maps/test1.osu", lazy=True)
+        self.assertEqual(beatmap.version, 14)
+        self.assertIn("HitObjects", beatmap._pending_sections)
+
+        self.assertEqual(beatmap.metadata.Creator, "Fullerene-")
+        self.assertNotIn("Metadata", beatmap._pending_sections)
+        self.assertIn("HitObjects", beatmap._pending_sections)
+
+        eager = bm.read_from_file("maps/test1.osu")
+        self.assertEqual([x._tuple() for x in beatmap.objects], [x._tuple() for x in eager.objects])
+        self.assertEqual([str(x) for x in beatmap.timing_points], [str(x) for x in eager.timing_points])
+        self.assertEqual(beatmap.events, eager.events)
+
+    def test_lazy_assignment_discards_section(self):
+        beatmap = bm.read_from_file("maps/test1.osu", lazy=True)
+        beatmap.objects = []
+        self.assertNotIn("HitObjects", beatmap._pending_sections)
+        self.assertEqual(beatmap.objects, [])
+
+    def test_lazy_assignment_keeps_shared_section(self):
+        with open("maps/test1.osu", encoding="utf-8") as f:
+            text = f.read().replace("//Storyboard Sound Samples", "//Storyboard Sound Samples\nSample,500,0,\"a.wav\",70")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = os.path.join(directory, "samples.osu")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(text)
+
+        eager = bm.read_from_file(filename)
+        self.assertTrue(eager.events)
+        self.assertEqual(len(eager.sb_samples), 1)
+        sample = (1000, "0", "\"kick.wav\"")
+
+        beatmap = bm.read_from_file(filename, lazy=True)
+        beatmap.sb_samples = [sample]
+        out = io.StringIO()
+        bm.write_to_file(beatmap, out)
+        written = bm.read_from_file(io.StringIO(out.getvalue()))
+        self.assertEqual(written.events, eager.events)
+        self.assertEqual(list(written.sb_samples), [sample + ("100",)])
+
+        beatmap = bm.read_from_file(filename, lazy=True)
+        beatmap.events = []
+        out = io.StringIO()
+        bm.write_to_file(beatmap, out)
+        written = bm.read_from_file(io.StringIO(out.getvalue()))
+        self.assertEqual(written.events, [])
+        self.assertEqual(list(written.sb_samples), list(eager.sb_samples))
+
+    def test_write_round_trip(self):
+        first = io.StringIO()
+        bm.write_to_file(bm.read_from_file("maps/test1.osu"), first)
+        second = io.StringIO()
+        bm.write_to_file(bm.read_from_file(io.StringIO(first.getvalue())), second)
+        self.assertEqual(first.getvalue(), second.getvalue())
+
+    def test_write_lazy_reuses_unmodified_sections(self):
+        eager = io.StringIO()
+        bm.write_to_file(bm.read_from_file("maps/test1.osu", columnar=True), eager)
+
+        beatmap = bm.read_from_file("maps/test1.osu", lazy=True, columnar=True)
+        self.assertIsNotNone(beatmap._get_unmodified_section("HitObjects"))
+        beatmap.objects.time
+        self.assertIsNotNone(beatmap._get_unmodified_section("HitObjects"))
+
+        beatmap.objects[0].x += 1
+        self.assertIsNone(beatmap._get_unmodified_section("HitObjects"))
+        beatmap.objects[0].x -= 1
+
+        # Unmodified sections keep the formatting of the source file, so compare what they parse to.
+        out = io.StringIO()
+        bm.write_to_file(beatmap, out)
+        rewritten = io.StringIO()
+        bm.write_to_file(bm.read_from_file(io.StringIO(out.getvalue()), columnar=True), rewritten)
+        self.assertEqual(rewritten.getvalue(), eager.getvalue())
+
+    def test_write_lazy_over_source(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = os.path.join(directory, "test1.osu")
+        shutil.copyfile("maps/test1.osu", filename)
+
+        expected = io.StringIO()
+        bm.write_to_file(bm.read_from_file("maps/test1.osu"), expected)
+
+        beatmap = bm.read_from_file(filename, lazy=True)
+        beatmap.objects
+        bm.write_to_file(beatmap, filename)
+        written = io.StringIO()
+        bm.write_to_file(bm.read_from_file(filename), written)
+        self.assertEqual(written.getvalue(), expected.getvalue())
+        self.assertEqual(os.listdir(directory), ["test1.osu"])
+
+        # The beatmap is still usable after its source was replaced.
+        bm.write_to_file(beatmap, filename)
+        written = io.StringIO()
+        bm.write_to_file(bm.read_from_file(filename), written)
+        self.assertEqual(written.getvalue(), expected.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import io
+import unittest
+
+import osutk.osufile.beatmap as bm
+from osutk.osufile import binary
+
+__author__ = 'Agka'
+
+EXTRA = """
+[Colours]
+Combo1 : 255,128,0
+Combo2 : 0,0,255
+
+[HitObjects]
+256,192,90000,2,0,B|300:200|350:180,1,140
+256,192,90500,6,0,P|300:200|350:180,2,140.5,2|0|8,0:0|1:2|0:0,1:2:0:0:
+256,192,91000,12,0,92000,0:0:0:0:
+64,192,93000,5,2,0:0:0:70:kick.wav
+"""
+
+
+def _written(beatmap):
+    out = io.StringIO()
+    bm.write_to_file(beatmap, out)
+    return out.getvalue()
+
+
+class TestBinary(unittest.TestCase):
+    def test_round_trip(self):
+        for columnar in (False, True):
+            beatmap = bm.read_from_file("maps/test1.osu", columnar=columnar)
+            data = binary.dumps(beatmap)
+            loaded = binary.loads(data)
+            self.assertEqual(_written(loaded), _written(beatmap))
+            self.assertEqual(binary.dumps(loaded), data)
+
+    def test_round_trip_sliders_and_colours(self):
+        with open("maps/test1.osu", encoding="utf-8") as f:
+            text = f.read()
+        text = text.replace("[HitObjects]", EXTRA.strip() + "\n", 1)
+        beatmap = bm.read_from_file(io.StringIO(text), columnar=True)
+        beatmap.sb_samples.append((5, "0", "\"a.wav\""))
+
+        out = io.BytesIO()
+        binary.save(beatmap, out)
+        loaded = binary.load(io.BytesIO(out.getvalue()))
+        self.assertEqual(_written(loaded), _written(beatmap))
+        self.assertEqual(loaded.colors[1].Green, 128)
+        self.assertEqual(loaded.objects[1].edge_hitsound, "2|0|8")
+        self.assertEqual(loaded.objects.samples, beatmap.objects.samples)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, binary.loads, b"OSU")
+        self.assertRaises(ValueError, binary.loads, b"nope" + bytes(60))
+
+        data = binary.dumps(bm.read_from_file("maps/test1.osu"))
+        self.assertRaises(ValueError, binary.loads, data[:-100])
+
+
+if __name__ == "__main__":
+    unittest.main()
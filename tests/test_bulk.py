@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import osutk.osufile.beatmap as bm
+import osutk.osufile.bulk as bulk
+
+__author__ = 'Agka'
+
+
+class TestBulk(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for folder in ("b", "a", os.path.join("a", "c")):
+            os.makedirs(os.path.join(self.directory, folder), exist_ok=True)
+            shutil.copyfile("maps/test1.osu", os.path.join(self.directory, folder, "map.osu"))
+
+        open(os.path.join(self.directory, "a", "notes.txt"), "w").close()
+        open(os.path.join(self.directory, "b", "empty.osu"), "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_find_beatmaps(self):
+        paths = [os.path.relpath(x, self.directory) for x in bulk.find_beatmaps(self.directory)]
+        self.assertEqual(paths, [os.path.join("a", "map.osu"), os.path.join("a", "c", "map.osu"),
+                                 os.path.join("b", "empty.osu"), os.path.join("b", "map.osu")])
+
+    def test_load_requested_sections(self):
+        beatmap = bulk.load_beatmap("maps/test1.osu", ["Metadata"])
+        self.assertEqual(beatmap.metadata.Creator, "Fullerene-")
+        self.assertIn("HitObjects", beatmap._pending_sections)
+
+        eager = bm.read_from_file("maps/test1.osu")
+        self.assertEqual([str(x) for x in beatmap.objects], [str(x) for x in eager.objects])
+        self.assertEqual(beatmap.events, eager.events)
+
+    def test_load_all_sections(self):
+        beatmap = bulk.load_beatmap("maps/test1.osu", columnar=True)
+        self.assertEqual(beatmap._pending_sections, {})
+        eager = bm.read_from_file("maps/test1.osu")
+        self.assertEqual([str(x) for x in beatmap.timing_points], [str(x) for x in eager.timing_points])
+
+    def test_iter_metadata(self):
+        errors = []
+        records = list(bulk.iter_metadata(self.directory, on_error=lambda path, e: errors.append(path)))
+        self.assertEqual(len(records), 3)
+        self.assertEqual({x.metadata.Creator for x in records}, {"Fullerene-"})
+        self.assertEqual(records[0].version, 14)
+        self.assertEqual([os.path.basename(x) for x in errors], ["empty.osu"])
+
+        self.assertRaises(ValueError, list, bulk.iter_metadata(self.directory))
+
+    def test_iter_beatmaps(self):
+        loaded = list(bulk.iter_beatmaps(self.directory, on_error=lambda path, e: None))
+        self.assertEqual(len(loaded), 3)
+        path, beatmap = loaded[0]
+        self.assertTrue(path.endswith("map.osu"))
+        self.assertEqual(len(beatmap.objects), len(bm.read_from_file("maps/test1.osu").objects))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import osutk.osufile.beatmap as bm
+from osutk.osufile.cache import BeatmapCache
+
+__author__ = 'Agka'
+
+
+def _written(beatmap):
+    out = io.StringIO()
+    bm.write_to_file(beatmap, out)
+    return out.getvalue()
+
+
+class TestBeatmapCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "test1.osu")
+        shutil.copyfile("maps/test1.osu", self.filename)
+        self.cache = BeatmapCache(os.path.join(self.directory, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_warm_load_matches_parse(self):
+        expected = _written(bm.read_from_file(self.filename, columnar=True))
+        self.assertEqual(_written(self.cache.read(self.filename)), expected)
+
+        warm = self.cache.read(self.filename)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(_written(warm), expected)
+        self.assertFalse(warm.objects.modified)
+        self.assertEqual(warm.get_effective_timing_point(warm.objects[-1].time).time,
+                         bm.read_from_file(self.filename).get_effective_timing_point(warm.objects[-1].time).time)
+
+    def test_changed_file_is_parsed_again(self):
+        self.cache.read(self.filename)
+        beatmap = bm.read_from_file(self.filename)
+        beatmap.metadata.Title = "changed"
+        with open(self.filename, "w", encoding="utf-8") as out:
+            bm.write_to_file(beatmap, out)
+
+        self.assertEqual(self.cache.read(self.filename).metadata.Title, "changed")
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_touched_file_is_hashed(self):
+        self.cache.read(self.filename)
+        stat = os.stat(self.filename)
+        os.utime(self.filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.cache.read(self.filename)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_eviction(self):
+        self.cache.read(self.filename)
+        entry_size = self.cache.total_size()
+
+        other = os.path.join(self.directory, "other.osu")
+        shutil.copyfile(self.filename, other)
+        self.cache.max_size = entry_size * 3 // 2
+        self.cache.read(other)
+
+        self.assertEqual(self.cache.total_size(), entry_size)
+        self.cache.read(other)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_misses_scan_once(self):
+        others = []
+        for i in range(5):
+            other = os.path.join(self.directory, "{}.osu".format(i))
+            shutil.copyfile(self.filename, other)
+            others.append(other)
+
+        with mock.patch.object(self.cache, "_entries", wraps=self.cache._entries) as entries:
+            for other in others:
+                self.cache.read(other)
+            self.assertEqual(entries.call_count, 1)
+
+        running = self.cache._total_size
+        self.assertEqual(self.cache.total_size(), running)
+        self.cache.invalidate(others[0])
+        self.assertEqual(self.cache._total_size, self.cache.total_size())
+        self.assertLess(self.cache._total_size, running)
+
+    def test_damaged_entry(self):
+        self.cache.read(self.filename)
+        with open(self.cache._entry_path(self.filename), "wb") as entry:
+            entry.write(b"garbage")
+        self.assertEqual(len(self.cache.read(self.filename).objects), len(bm.read_from_file(self.filename).objects))
+        self.assertEqual(self.cache.misses, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from itertools import combinations
+from operator import itemgetter
+
+from osutk.objects.hitobject import HitCircle
+from osutk.osufile.beatmap import Hitsound
+from tools.copy_hitsounds import (ObjectsByPosition, assign_sounds_to_objects_optimally, do_hitsound_copy,
+                                  match_positions, merge_by_time, sound_difference)
+
+__author__ = 'Agka'
+
+
+class TestMergeByTime(unittest.TestCase):
+    def test_groups(self):
+        first = [(100, "a"), (100, "b"), (200, "c")]
+        second = [(200, "d"), (300, "e")]
+        merged = list(merge_by_time([100, 200, 300], (first, itemgetter(0)), (second, itemgetter(0))))
+        self.assertEqual(merged, [
+            (100, [[(100, "a"), (100, "b")], []]),
+            (200, [[(200, "c")], [(200, "d")]]),
+            (300, [[], [(300, "e")]]),
+        ])
+
+    def test_skipped_moments(self):
+        items = [(50, "a"), (150, "b"), (200, "c"), (250, "d")]
+        merged = list(merge_by_time([100, 200, 300], (items, itemgetter(0))))
+        self.assertEqual(merged, [(100, [[]]), (200, [[(200, "c")]]), (300, [[]])])
+
+    def test_trailing_items(self):
+        items = [(100, "a"), (400, "b"), (500, "c")]
+        merged = list(merge_by_time([100, 200], (items, itemgetter(0)), ([], itemgetter(0))))
+        self.assertEqual(merged, [(100, [[(100, "a")], []]), (200, [[], []])])
+
+    def test_no_moments(self):
+        self.assertEqual(list(merge_by_time([], ([(100, "a")], itemgetter(0)))), [])
+
+
+class TestSoundDifference(unittest.TestCase):
+    def setUp(self):
+        self.clap = Hitsound(1, 0, 8, False)
+        self.whistle = Hitsound(1, 0, 2, False)
+        self.sample = Hitsound(custom_sample="kick.wav")
+
+    def test_empty(self):
+        self.assertEqual(sound_difference([], [(self.clap, "x")]), ([], []))
+        self.assertEqual(sound_difference([self.clap], []), ([], [self.clap]))
+
+    def test_nothing_shared(self):
+        self.assertEqual(sound_difference([self.clap, self.sample], [(self.whistle, "x")]),
+                         ([], [self.clap, self.sample]))
+
+    def test_shared_sounds(self):
+        pre_existing, difference = sound_difference([self.sample, self.clap, self.whistle],
+                                                    [(self.whistle, "x"), (self.sample, None), (self.clap, "y")])
+        self.assertEqual(pre_existing, [(self.whistle, "x"), (self.sample, None), (self.clap, "y")])
+        self.assertEqual(difference, [])
+
+    def test_repeated_sounds(self):
+        source = [self.clap, self.whistle, self.clap, self.sample, self.clap]
+        pre_existing, difference = sound_difference(source, [(self.clap, "x"), (self.clap, "y"), (self.sample, "z"),
+                                                             (self.sample, "w")])
+        # Only as many destination sounds as the source has are matched, and the first occurrences are taken out.
+        self.assertEqual(pre_existing, [(self.clap, "x"), (self.clap, "y"), (self.sample, "z")])
+        self.assertEqual(difference, [self.whistle, self.clap])
+        self.assertIs(difference[1], source[4])
+
+
+class TestObjectsByPosition(unittest.TestCase):
+    def test_nearest(self):
+        objects = ObjectsByPosition([HitCircle(x, 192, 1000, 0) for x in (320, 64, 448, 192)])
+        self.assertEqual(objects.positions, [64, 192, 320, 448])
+        self.assertEqual(objects.nearest(0), 0)
+        self.assertEqual(objects.nearest(200), 1)
+        self.assertEqual(objects.nearest(500), 3)
+        # A tie goes to the left.
+        self.assertEqual(objects.nearest(128), 0)
+        self.assertEqual(objects.nearest(384), 2)
+
+    def test_same_position(self):
+        first, second = HitCircle(192, 192, 1000, 0), HitCircle(192, 192, 1000, 0)
+        objects = ObjectsByPosition([HitCircle(448, 192, 1000, 0), first, second])
+        self.assertIs(objects.objects[objects.nearest(192)], first)
+        self.assertIs(objects.pop(objects.nearest(300)), first)
+        self.assertIs(objects.objects[objects.nearest(320)], second)
+        self.assertEqual(len(objects), 2)
+
+    def test_nearest_matches_min(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            given = [HitCircle(rng.choice((64, 192, 320, 448)), 192, 1000, 0) for _ in range(rng.randint(1, 6))]
+            objects = ObjectsByPosition(given)
+            x = rng.choice((0, 64, 128, 192, 256, 320, 384, 448, 512))
+            closest = min(given, key=lambda obj: (abs(obj.x - x), obj.x))
+            self.assertIs(objects.objects[objects.nearest(x)], closest)
+
+    def test_leftmost_empty(self):
+        objects = ObjectsByPosition([HitCircle(x, 192, 1000, hitsound) for x, hitsound in ((64, 2), (320, 0), (192, 0))])
+        self.assertEqual(objects.leftmost_empty(), 1)
+        objects = ObjectsByPosition([HitCircle(x, 192, 1000, 2) for x in (320, 64)])
+        self.assertEqual(objects.leftmost_empty(), 0)
+
+
+class TestMatchPositions(unittest.TestCase):
+    def test_ties_go_left(self):
+        self.assertEqual(match_positions([128], [64, 192]), [0])
+        self.assertEqual(match_positions([150, 250], [100, 200, 300]), [0, 1])
+        self.assertEqual(match_positions([200, 200], [100, 200, 200, 300]), [1, 2])
+
+    def test_optimal_without_crossings(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            positions = sorted(rng.choice((64, 192, 320, 448)) for _ in range(rng.randint(1, 6)))
+            targets = sorted(rng.choice((0, 64, 128, 192, 256, 320, 384, 448, 512))
+                             for _ in range(rng.randint(0, len(positions))))
+            matches = match_positions(targets, positions)
+
+            self.assertEqual(matches, sorted(set(matches)))
+            best = min((sum(abs(t - positions[j]) for t, j in zip(targets, chosen))
+                        for chosen in combinations(range(len(positions)), len(targets))), default=0)
+            self.assertEqual(sum(abs(t - positions[j]) for t, j in zip(targets, matches)), best)
+
+    def test_assign_optimally(self):
+        left, right, far = HitCircle(190, 192, 1000, 0), HitCircle(400, 192, 1000, 0), HitCircle(500, 192, 1000, 0)
+        first, second, new = Hitsound(1, 0, 2, False), Hitsound(1, 0, 8, False), Hitsound(2, 0, 8, False)
+        last_sounds = {first: 100, second: 200}
+
+        # Placed one at a time, second would take the closest object and push first to the far right.
+        snd_map, reminder = assign_sounds_to_objects_optimally({far, right, left}, last_sounds, 3,
+                                                               [second, first, new])
+        self.assertEqual(snd_map, [(second, right), (first, left), (new, far)])
+        self.assertEqual(reminder, [])
+        self.assertEqual(last_sounds, {first: 190, second: 400, new: 500})
+
+
+class TestHitsoundCopy(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, "source.osu")
+        self.destination = os.path.join(self.directory, "destination.osu")
+        shutil.copyfile("maps/test1.osu", self.source)
+        shutil.copyfile("maps/test1.osu", self.destination)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertCopied(self, expected_filename, **options):
+        messages = []
+        do_hitsound_copy(self.source, self.destination, messages.append, **options)
+        self.assertEqual(messages[-1], "~")
+        with open(self.destination) as out, open(expected_filename) as expected:
+            self.assertEqual(out.read(), expected.read())
+
+    def test_copy(self):
+        self.assertCopied("maps/test1_hitsounds_copied.osu")
+
+    def test_copy_without_hitnormals(self):
+        self.assertCopied("maps/test1_hitsounds_copied_no_hitnormals.osu", copy_nonauto_hitnormals=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
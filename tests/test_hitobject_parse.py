@@ -0,0 +1,52 @@
+import unittest
+
+from osutk.objects import HitObject, HitCircle, Hold, Spinner, Slider
+
+__author__ = 'Agka'
+
+
+def tolerant_parse(string):
+    return HitObject._from_entries(string, string.split(","))
+
+
+class TestHitObjectParse(unittest.TestCase):
+    lines = ["64,192,1708,1,2,0:0:0:0:",
+             "64,192,1708,5,2,1:2:3:40:hi.wav",
+             "448,0,1708,128,0,3554:1:2:0:70:x.wav",
+             "256,192,91000,12,0,92000,0:0:0:0:",
+             "64,192,1,1,0,0:0:0::",
+             "64,192,1,1,0,0:0:0:0",
+             "256,192,90000,2,0,B|300:200|350:180,1,140"]
+
+    def test_same_as_tolerant_path(self):
+        for line in self.lines:
+            fast = HitObject.from_string(line)
+            slow = tolerant_parse(line)
+            self.assertIs(type(fast), type(slow))
+            self.assertEqual(fast._tuple(), slow._tuple())
+            self.assertEqual(fast.type, slow.type)
+            self.assertEqual(getattr(fast, "end_time", None), getattr(slow, "end_time", None))
+
+    def test_kinds(self):
+        self.assertIsInstance(HitObject.from_string(self.lines[0]), HitCircle)
+        self.assertIsInstance(HitObject.from_string(self.lines[2]), Hold)
+        self.assertIsInstance(HitObject.from_string(self.lines[3]), Spinner)
+        self.assertIsInstance(HitObject.from_string(self.lines[6]), Slider)
+
+        hold = HitObject.from_string(self.lines[2])
+        self.assertEqual(hold.end_time, 3554)
+        self.assertEqual(hold.custom_sample, "x.wav")
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, HitObject.from_string, "64,192,abc,1,0,0:0:0:0:")
+        self.assertRaises(ValueError, HitObject.from_string, "64,192")
+
+    def test_write_round_trip(self):
+        for line in ("256,192,90000,2,0,B|300:200|350:180,1,140",
+                     "256,192,90000,6,0,P|300:200|350:180,2,140.5,2|0|8,0:0|1:2|0:0,1:2:0:0:",
+                     "256,192,91000,12,0,92000,0:0:0:0:"):
+            self.assertEqual(str(HitObject.from_string(line)), line)
+
+
+if __name__ == "__main__":
+    unittest.main()
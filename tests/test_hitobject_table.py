@@ -0,0 +1,95 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import osutk.osufile.beatmap as bm
+from osutk.objects import HitObject, HitObjectTable, Hold, Slider
+
+__author__ = 'Agka'
+
+
+class TestHitObjectTable(unittest.TestCase):
+    def setUp(self):
+        self.beatmap = bm.read_from_file("maps/test1.osu")
+        self.columnar = bm.read_from_file("maps/test1.osu", columnar=True)
+
+    def test_same_objects(self):
+        self.assertIsInstance(self.columnar.objects, HitObjectTable)
+        self.assertEqual(len(self.columnar.objects), len(self.beatmap.objects))
+        self.assertEqual([x._tuple() for x in self.columnar.objects], [x._tuple() for x in self.beatmap.objects])
+        self.assertEqual([str(x) for x in self.columnar.objects], [str(x) for x in self.beatmap.objects])
+
+    def test_view_api(self):
+        obj = self.columnar.get_object_at_time(44169)
+        self.assertIsInstance(obj, HitObject)
+        self.assertEqual(obj.end_time, 44400)
+        self.assertEqual(obj.duration, 44400 - 44169)
+        self.assertEqual(self.columnar.get_mania_lane(obj), 0)
+        self.assertEqual(self.columnar.get_object_at_time(17054).custom_sample, "hi.wav")
+
+    def test_view_writes_through(self):
+        obj = self.columnar.objects[0]
+        obj.hitsound = HitObject.SND_CLAP
+        obj.custom_sample = "clap.wav"
+        self.assertEqual(self.columnar.objects[0].hitsound, HitObject.SND_CLAP)
+        self.assertEqual(self.columnar.objects[0].custom_sample, "clap.wav")
+
+        obj.reset_hitsound()
+        self.assertEqual(self.columnar.objects[0].hitsound, 0)
+        self.assertEqual(self.columnar.objects[0].custom_sample, "")
+
+    def test_to_object(self):
+        obj = self.columnar.get_object_at_time(44169).to_object()
+        self.assertIsInstance(obj, Hold)
+        self.assertEqual(obj._tuple(), self.beatmap.get_object_at_time(44169)._tuple())
+
+    def test_slider_points_copied(self):
+        slider = Slider.from_string("256,192,1000,2,0,B|300:200|350:180,1,140")
+        table = HitObjectTable([slider])
+        table.modified = False
+
+        slider.points[0]["x"] = 0
+        slider.points.append({"x": 1, "y": 1})
+        self.assertEqual(table[0].points, [{"x": 300, "y": 200}, {"x": 350, "y": 180}])
+        self.assertFalse(table.modified)
+
+        copy = table.to_object(0)
+        copy.points[0]["x"] = 0
+        self.assertEqual(table[0].points[0]["x"], 300)
+        self.assertFalse(table.modified)
+
+    def test_view_points_edits(self):
+        with open("maps/test1.osu", encoding="utf-8") as f:
+            text = f.read().replace("[HitObjects]\n", "[HitObjects]\n256,192,1000,2,0,B|300:200|350:180,1,140\n")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = os.path.join(directory, "slider.osu")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(text)
+
+        beatmap = bm.read_from_file(filename, lazy=True, columnar=True)
+        view = beatmap.objects[0]
+        view.points.append({"x": 1, "y": 1})
+        view.points[0]["x"] = 5
+        self.assertEqual(view.points, [{"x": 300, "y": 200}, {"x": 350, "y": 180}])
+        self.assertFalse(beatmap.objects.modified)
+
+        points = view.points
+        points.append({"x": 1, "y": 1})
+        view.points = points
+        points[0]["x"] = 5
+        self.assertTrue(beatmap.objects.modified)
+
+        out = io.StringIO()
+        bm.write_to_file(beatmap, out)
+        self.assertIn("256,192,1000,2,0,B|300:200|350:180|1:1,1,140", out.getvalue())
+
+    def test_samples_interned(self):
+        table = HitObjectTable(self.beatmap.objects)
+        self.assertEqual(len(table.samples), len(set(x.custom_sample for x in self.beatmap.objects)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 from osutk.objects import HitObject, HitCircle
@@ -25,6 +26,32 @@ class HsHash(unittest.TestCase):
         b = Hitsound()
         self.assertEqual(len({a, b}), 1)
 
+    def test_shared_instance(self):
+        self.assertIs(Hitsound(1, 0, 2, False), Hitsound.get(1, 0, 2, False))
+        self.assertIs(Hitsound(custom_sample="hi.wav"), Hitsound(2, 1, 0, custom_sample="hi.wav"))
+        self.assertIsNot(Hitsound(1, 0, 2, False), Hitsound(1, 0, 2, True))
+        self.assertIs(pickle.loads(pickle.dumps(Hitsound(custom_sample="hi.wav"))), Hitsound(custom_sample="hi.wav"))
+
+    def test_fields_follow_key(self):
+        short = Hitsound(1, 0, 2, custom_sample="ab")
+        self.assertIs(short, Hitsound(1, 0, 2, False))
+        self.assertEqual(short.custom_sample, "")
+
+        custom = Hitsound(2, 1, 8, custom_sample="kick.wav")
+        self.assertIs(custom, Hitsound(custom_sample="kick.wav"))
+        self.assertEqual((custom.sample_set, custom.custom_set, custom.hitsound), (0, 0, 0))
+
+    def test_immutable(self):
+        a = Hitsound(1, 0, 2, False)
+        self.assertRaises(AttributeError, setattr, a, "hitsound", 8)
+        self.assertIs(a.replace(hitsound=8), Hitsound(1, 0, 8, False))
+        self.assertEqual(a.hitsound, 2)
+
+    def test_custom_sample_interned(self):
+        a = HitObject.from_string("64,192,1000,1,0,0:0:0:70:" + "".join(["kick", ".wav"]))
+        b = HitObject.from_string("64,192,2000,1,0,0:0:0:70:" + "".join(["ki", "ck.wav"]))
+        self.assertIs(a.custom_sample, b.custom_sample)
+
 
 class HoHash(unittest.TestCase):
     def test_hash(self):
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from osutk.osufile.parallel import map_beatmaps
+
+__author__ = 'Agka'
+
+
+def object_count(beatmap):
+    return len(beatmap.objects)
+
+
+def version(beatmap):
+    return beatmap.version
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for index in range(5):
+            path = os.path.join(self.directory, "{}.osu".format(index))
+            shutil.copyfile("maps/test1.osu", path)
+            self.paths.append(path)
+
+        self.bad_path = os.path.join(self.directory, "bad.osu")
+        with open(self.bad_path, "w") as f:
+            f.write("not a beatmap\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_ordered(self):
+        paths = self.paths[:2] + [self.bad_path] + self.paths[2:]
+        for processes in (1, 2):
+            results = list(map_beatmaps(paths, object_count, processes, chunksize=1))
+            self.assertEqual([x.path for x in results], paths)
+            self.assertEqual(len({x.value for x in results if x.error is None}), 1)
+            self.assertIsNone(results[2].value)
+            self.assertIn("ValueError", results[2].error)
+
+    def test_unordered(self):
+        results = list(map_beatmaps(self.paths, object_count, 2, ordered=False, columnar=True))
+        self.assertEqual(sorted(x.path for x in results), sorted(self.paths))
+        self.assertTrue(all(x.error is None for x in results))
+
+    def test_interleaved_in_process(self):
+        counts = map_beatmaps(self.paths, object_count, 1)
+        versions = map_beatmaps(self.paths, version, 1)
+        first_count = next(counts).value
+        first_version = next(versions).value
+        self.assertNotEqual(first_count, first_version)
+        self.assertEqual(next(counts).value, first_count)
+        self.assertEqual(next(versions).value, first_version)
+
+    def test_empty(self):
+        self.assertEqual(list(map_beatmaps([], object_count)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import osutk.osufile.beatmap as bm
+from osutk.objects.sampleset import SampleSet
+from osutk.objects.timing_point import TimingPoint
+
+__author__ = 'Agka'
+
+
+class TestSectionPatcher(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "test1.osu")
+        shutil.copyfile("maps/test1.osu", self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_patch_keeps_other_sections(self):
+        original = bm.read_from_file(self.filename)
+        patcher = bm.SectionPatcher(self.filename)
+        timing = [x for x in original.timing_points if x.uninherited]
+
+        patcher.patch({"TimingPoints": timing})
+        patcher.patch({"Events": patcher.read_section("Events") + "Sample,5,0,\"a.wav\",70\n"})
+
+        patched = bm.read_from_file(self.filename)
+        self.assertEqual([str(x) for x in patched.timing_points], [str(x) for x in timing])
+        self.assertEqual([str(x) for x in patched.objects], [str(x) for x in original.objects])
+        self.assertEqual(patched.metadata.__dict__, original.metadata.__dict__)
+        self.assertEqual(len(patched.sb_samples), len(original.sb_samples) + 1)
+        self.assertEqual(os.listdir(self.directory), ["test1.osu"])
+
+    def test_failed_patch_cleans_up(self):
+        patcher = bm.SectionPatcher(self.filename)
+        open_fds = len(os.listdir("/proc/self/fd"))
+        with mock.patch.object(bm, "open", side_effect=OSError, create=True):
+            self.assertRaises(OSError, patcher.patch, {"Events": ""})
+        self.assertEqual(len(os.listdir("/proc/self/fd")), open_fds)
+        self.assertEqual(os.listdir(self.directory), ["test1.osu"])
+
+    def test_ranges_follow_patches(self):
+        patcher = bm.SectionPatcher(self.filename)
+        hitobjects = patcher.read_section("HitObjects")
+        for count in (1, 50, 3):
+            timing = [TimingPoint(t, -50.0, 4, 0, SampleSet("Soft", 60, 0), 0) for t in range(count)]
+            patcher.patch({"TimingPoints": timing, "NewSection": "a:b"})
+            self.assertEqual(patcher._ranges, bm.SectionPatcher(self.filename)._ranges)
+
+        self.assertEqual(patcher.read_section("HitObjects").rstrip(), hitobjects.rstrip())
+        self.assertEqual(patcher.read_section("NewSection"), "a:b\n")
+
+    def test_replace_timing_section(self):
+        out_filename = os.path.join(self.directory, "out.osu")
+        inherited = [TimingPoint(1000, -50.0, 4, 0, SampleSet("Soft", 60, 0), 0)]
+        bm.replace_timing_section(self.filename, out_filename, inherited)
+
+        original = bm.read_from_file(self.filename)
+        out = bm.read_from_file(out_filename)
+        self.assertEqual(out.get_inherited_points()[0].value, -50.0)
+        self.assertEqual(len(out.timing_points), len(original.get_uninherited_points()) + 1)
+        self.assertEqual([str(x) for x in out.objects], [str(x) for x in original.objects])
+
+    def test_replace_missing_timing_section(self):
+        with open(self.filename, encoding="utf-8") as f:
+            text = f.read()
+        start = text.index("[TimingPoints]")
+        with open(self.filename, "w", encoding="utf-8") as f:
+            f.write(text[:start] + text[text.index("[", start + 1):])
+        self.assertNotIn("TimingPoints", bm.SectionPatcher(self.filename).sections)
+
+        inherited = [TimingPoint(1000, -50.0, 4, 0, SampleSet("Soft", 60, 0), 0)]
+        bm.replace_timing_section(self.filename, self.filename, inherited)
+        out = bm.read_from_file(self.filename)
+        self.assertEqual([str(x) for x in out.timing_points], [str(x) for x in inherited])
+
+
+if __name__ == "__main__":
+    unittest.main()
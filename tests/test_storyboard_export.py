@@ -0,0 +1,58 @@
+import io
+import unittest
+
+from osutk.storyboard import Sprite, Storyboard, Layer, Ease
+
+__author__ = 'Agka'
+
+
+class TestStoryboardExport(unittest.TestCase):
+    def setUp(self):
+        self.sprites = Storyboard._sprites
+        Storyboard._sprites = []
+
+    def tearDown(self):
+        Storyboard._sprites = self.sprites
+
+    def test_layers_in_order(self):
+        front = Sprite(layer=Layer.Foreground, file="front.png")
+        front.fade(_st=0, _et=100)
+        Sprite(layer=Layer.Background, file="empty.png", location=(10, 20))
+        back = Sprite(layer=Layer.Background, file="back.png")
+        back.move(Ease.Linear, 0, 100, 0, 0, 10, 10)
+
+        out = io.StringIO()
+        Storyboard.export(out)
+        self.assertEqual(out.getvalue(), "\n".join([
+            "[Events]",
+            "//Background and Video events",
+            "//Storyboard Layer 0 (Background)",
+            str(Storyboard._sprites[1]),
+            str(back),
+            "//Storyboard Layer 1 (Fail)",
+            "//Storyboard Layer 2 (Pass)",
+            "//Storyboard Layer 3 (Foreground)",
+            str(front),
+        ]) + "\n")
+        self.assertEqual(str(Storyboard._sprites[1]), 'Sprite,Background,TopLeft,"empty.png",10,20\n')
+
+    def test_parallel_matches_serial(self):
+        for i in range(40):
+            sprite = Sprite(layer=(Layer.Pass, Layer.Background)[i % 2], file="{}.png".format(i), location=(i, 0))
+            for k in range(i % 5):
+                sprite.fade(_st=k * 100, _et=k * 100 + 50, _sv=0, _ev=1)
+
+        serial = io.StringIO()
+        Storyboard.export(serial)
+        parallel = io.StringIO()
+        Storyboard.export(parallel, processes=2, chunksize=3)
+        self.assertEqual(parallel.getvalue(), serial.getvalue())
+
+    def test_lines_match_str(self):
+        sprite = Sprite(file="a.png")
+        sprite.fade(_st=0, _et=100).scale(_st=0, _et=100, _ss=1, _es=2)
+        self.assertEqual("\n".join(sprite.lines()), str(sprite))
+
+
+if __name__ == "__main__":
+    unittest.main()
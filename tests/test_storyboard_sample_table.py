@@ -0,0 +1,63 @@
+import io
+import unittest
+
+import osutk.osufile.beatmap as bm
+from osutk.objects import StoryboardSampleTable
+
+__author__ = 'Agka'
+
+
+class TestStoryboardSampleTable(unittest.TestCase):
+    def setUp(self):
+        self.table = StoryboardSampleTable([(300, "0", "b.wav"), (100, "0", "a.wav", "70"), (300, "0", "c.wav")])
+
+    def test_sorted_by_time(self):
+        self.assertEqual([x[2] for x in self.table], ["a.wav", "b.wav", "c.wav"])
+
+        self.table.add((200, "0", "d.wav"))
+        self.table.add((300, "0", "e.wav"))
+        self.table.add((50, "0", "f.wav"))
+        self.assertEqual([x[2] for x in self.table], ["f.wav", "a.wav", "d.wav", "b.wav", "c.wav", "e.wav"])
+        self.assertEqual(len(self.table), 6)
+
+    def test_lookups(self):
+        self.assertEqual([x[2] for x in self.table.at(300)], ["b.wav", "c.wav"])
+        self.assertEqual(self.table.at(300.0), self.table.at(300))
+        self.assertEqual(self.table.at(200), [])
+        self.assertEqual([x[2] for x in self.table.between(100, 300)], ["a.wav"])
+        self.assertEqual(len(self.table.between(0, 1000)), 3)
+        self.assertIn((100, "0", "a.wav", "70"), self.table)
+        self.assertNotIn((100, "0", "a.wav"), self.table)
+
+    def test_remove(self):
+        self.table.add((300, "0", "b.wav"))
+        self.table.remove((300, "0", "b.wav"))
+        self.assertEqual([x[2] for x in self.table.at(300)], ["c.wav", "b.wav"])
+        self.assertEqual([x[2] for x in self.table], ["a.wav", "c.wav", "b.wav"])
+
+        self.table.remove((100, "0", "a.wav", "70"))
+        self.assertEqual(self.table.at(100), [])
+        self.assertEqual(self.table.between(0, 200), [])
+        self.assertRaises(ValueError, self.table.remove, (100, "0", "a.wav", "70"))
+
+    def test_filenames_interned(self):
+        name = "".join(["kick", ".wav"])
+        self.table.add((400, "0", name))
+        self.table.add((500, "0", "".join(["kick", ".wav"])))
+        self.assertIs(self.table[-1][2], self.table[-2][2])
+
+    def test_beatmap_assignment(self):
+        beatmap = bm.read_from_file("maps/test1.osu")
+        self.assertIsInstance(beatmap.sb_samples, StoryboardSampleTable)
+
+        beatmap.sb_samples = {(2000, 0, "late.wav"), (1000, 0, "early.wav")}
+        self.assertIsInstance(beatmap.sb_samples, StoryboardSampleTable)
+
+        out = io.StringIO()
+        bm.write_to_file(beatmap, out)
+        text = out.getvalue()
+        self.assertLess(text.index("early.wav"), text.index("late.wav"))
+
+
+if __name__ == "__main__":
+    unittest.main()
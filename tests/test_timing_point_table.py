@@ -0,0 +1,48 @@
+import unittest
+
+import osutk.osufile.beatmap as bm
+from osutk.objects import SampleSet, TimingPoint, TimingPointTable
+
+__author__ = 'Agka'
+
+
+class TestTimingPointTable(unittest.TestCase):
+    def setUp(self):
+        self.beatmap = bm.read_from_file("maps/test1.osu")
+        self.columnar = bm.read_from_file("maps/test1.osu", columnar=True)
+
+    def test_same_points(self):
+        self.assertIsInstance(self.columnar.timing_points, TimingPointTable)
+        self.assertEqual([str(x) for x in self.columnar.timing_points],
+                         [str(x) for x in self.beatmap.timing_points])
+        self.assertEqual(self.columnar.timing_points[0].value, 461.538461538462)
+        self.assertEqual(self.columnar.timing_points[0].sample_set.kind, self.beatmap.timing_points[0].sample_set.kind)
+
+    def test_from_string_defaults(self):
+        for line in ("100,500", "100,-50,4,9,2,40,0,1", "100.5,300,3,2"):
+            self.assertEqual(str(TimingPointTable.from_string(line)[0]), str(TimingPoint.from_string(line)))
+
+    def test_view_writes_through(self):
+        tp = self.columnar.timing_points[3]
+        tp.value = -50
+        tp.sample_set.kind = "Drum"
+        tp.sample_set = SampleSet("Soft", 40, 2)
+        self.assertEqual(self.columnar.timing_points[3].value, -50)
+        self.assertEqual(self.columnar.timing_points[3].sample_set.get_osu_kind_index(), SampleSet.SOFT)
+        self.assertEqual(self.columnar.timing_points.custom_set[3], 2)
+
+    def test_effective_points(self):
+        self.columnar.sort_timing_points()
+        self.beatmap.sort_timing_points()
+        for t in sorted(self.beatmap.get_distinct_times()):
+            self.assertEqual(str(self.columnar.get_effective_timing_point(t)),
+                             str(self.beatmap.get_effective_timing_point(t)))
+
+    def test_sort(self):
+        table = TimingPointTable([TimingPoint(time=300), TimingPoint(time=100), TimingPoint(time=200)])
+        table.sort()
+        self.assertEqual(list(table.time), [100, 200, 300])
+
+
+if __name__ == "__main__":
+    unittest.main()
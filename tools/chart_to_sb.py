@@ -243,7 +243,7 @@ class StoryboardMap(object):
         self.gear.generate_gear()
 
         for lane in range(self.chart.lane_count):
-            self.storyboard_lane(lane, map(lambda x: x.time, self.chart.get_lane_objects(lane)))
+            self.storyboard_lane(lane, self.chart.get_lane_times(lane)[0])
 
         for pool in self.pools:
             pool.auto_fade_objects()
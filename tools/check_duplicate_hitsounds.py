@@ -2,9 +2,11 @@ import os
 from shutil import copyfile
 
 from osutk.osufile.beatmap import read_from_file, Beatmap, write_to_file
+from osutk.osufile.parallel import map_beatmaps
 from osutk.objects.hitobject import HitObject
 import sys
-from itertools import combinations
+from itertools import groupby
+from operator import attrgetter
 from osutk.translate import to_osu_time_notation
 
 dupentry = tuple[float, int, int, int, HitObject, HitObject]
@@ -13,34 +15,39 @@ dupentry = tuple[float, int, int, int, HitObject, HitObject]
 # only checks if additions are duplicate, not normals.
 def check_duplicates_at_time(beatmap: Beatmap, time: float) -> list[dupentry]:
     objects = beatmap.get_objects_at_time(time)
+    addition_sets = {id(obj): beatmap.get_effective_addition_set(obj) for obj in objects}
+    return check_duplicates_among(beatmap, time, objects, addition_sets)
+
+
+def check_duplicates_among(beatmap: Beatmap, time: float, objects: list[HitObject],
+                           addition_sets: dict[int, int]) -> list[dupentry]:
+    """
+    Find duplicate hitsounds among objects that share a time.
+    Only objects with the same custom sample, effective addition set and custom set can repeat each other's sounds,
+    so objects are bucketed by those first and only compared within their bucket.
+    @param addition_sets: The effective addition set of each object, by object id.
+    """
+    buckets = {}
+    for obj in objects:
+        key = (obj.custom_sample, addition_sets[id(obj)], obj.custom_set)
+        if key not in buckets:
+            buckets[key] = []
+        buckets[key].append(obj)
 
-    if len(objects) == 0:
-        return []
-
-    # get all distinct pairs where the object is not the same
     duplicates = []
-    obj_pairs = set(x for x in combinations(objects, 2) if x[0] != x[1])
-    for obj1, obj2 in obj_pairs:
-
-        # different samples, not duplicated
-        if obj1.custom_sample != obj2.custom_sample:
+    for bucket in buckets.values():
+        if len(bucket) < 2:
             continue
 
-        # different addition set, not duplicated
-        if beatmap.get_effective_addition_set(obj1) != beatmap.get_effective_addition_set(obj2):
-            continue
-
-        # different custom set, not duplicated
-        if obj1.custom_set != obj2.custom_set:
-            continue
+        lanes = [beatmap.get_mania_lane(obj) + 1 for obj in bucket]
+        for index2 in range(1, len(bucket)):
+            obj2 = bucket[index2]
+            for index1 in range(index2):
+                obj1 = bucket[index1]
 
-        lane1 = beatmap.get_mania_lane(obj1) + 1
-        lane2 = beatmap.get_mania_lane(obj2) + 1
-
-        # overlaid hitsound? but it's not just a hitnormal?
-        if (obj1.hitsound & obj2.hitsound) != 0:
-            duplicates.append((time, lane1, lane2, obj1.hitsound & obj2.hitsound, obj1, obj2))
-            continue
+                # overlaid hitsound? but it's not just a hitnormal?
+                if (obj1.hitsound & obj2.hitsound) != 0:
+                    duplicates.append((time, lanes[index1], lanes[index2], obj1.hitsound & obj2.hitsound, obj1, obj2))
 
     return duplicates
 
@@ -50,16 +57,62 @@ def deduplicate(duplicates: list[dupentry]):
         o2.hitsound &= (15 ^ sounds)
 
 
+def deduplicate_all(beatmap: Beatmap) -> int:
+    """
+    Remove all duplicate hitsounds in one pass: at each time, every object loses the sounds an object before it
+    in the same bucket already plays. This is what repeating deduplicate and find_all_duplicates converges to.
+    @return: The number of objects that lost sounds.
+    """
+    changed = 0
+    for moment, resolved_sounds in groupby(beatmap.resolve_all_sounds(), key=attrgetter("time")):
+        seen = {}
+        for resolved in resolved_sounds:
+            obj = resolved.obj
+            key = (obj.custom_sample, resolved.addition_set, obj.custom_set)
+            mask = seen.get(key, 0)
+            seen[key] = mask | obj.hitsound
+
+            overlap = obj.hitsound & mask
+            if overlap != 0:
+                obj.hitsound &= (15 ^ overlap)
+                changed += 1
+    return changed
+
+
 def find_all_duplicates(beatmap: Beatmap) -> list[dupentry]:
-    moments = beatmap.get_distinct_times()
     duplicates = []
-    for moment in moments:
-        moment_duplicates = check_duplicates_at_time(beatmap, moment)
+    for moment, resolved_sounds in groupby(beatmap.resolve_all_sounds(), key=attrgetter("time")):
+        resolved_sounds = list(resolved_sounds)
+        if len(resolved_sounds) < 2:
+            continue
 
-        duplicates.extend(moment_duplicates)
+        objects = [x.obj for x in resolved_sounds]
+        addition_sets = {id(x.obj): x.addition_set for x in resolved_sounds}
+        duplicates.extend(check_duplicates_among(beatmap, moment, objects, addition_sets))
     return duplicates
 
 
+def summarize_duplicates(beatmap: Beatmap) -> list[tuple[float, int, int, int]]:
+    """
+    Find all duplicates of a beatmap, keeping only (time, lane, lane, sounds) so it's cheap to send between processes.
+    """
+    beatmap.sort_timing_points()
+    return [(time, l1, l2, sounds) for time, l1, l2, sounds, o1, o2 in find_all_duplicates(beatmap)]
+
+
+def check_duplicates_in_files(filenames: list[str], msg, processes=None):
+    """
+    Report the number of duplicates of many beatmaps, reading and checking them in parallel.
+    """
+    for result in map_beatmaps(filenames, summarize_duplicates, processes):
+        if result.error is not None:
+            msg("{}: couldn't check: {}".format(result.path, result.error.strip().splitlines()[-1]))
+        else:
+            unique_duplicate_times = set(x[0] for x in result.value)
+            msg("{}: {} duplicates found at {} unique times.".format(result.path, len(result.value),
+                                                                    len(unique_duplicate_times)))
+
+
 def print_results(beatmap: Beatmap, duplicates: list[dupentry], unique_duplicate_times, msg):
     msg("{} duplicates found at {} unique times.".format(len(duplicates), len(unique_duplicate_times)))
     msg("All duplicates:")
@@ -94,14 +147,17 @@ def print_results(beatmap: Beatmap, duplicates: list[dupentry], unique_duplicate
         msg("{0}".format(to_osu_time_notation(t)))
 
 
-def check_duplicates(filename: str, should_print_results: bool, should_deduplicate: bool, msg):
+def check_duplicates(filename: str, should_print_results: bool, should_deduplicate: bool, msg) -> list[dupentry]:
+    """
+    @return: The duplicates found, before deduplicating.
+    """
     beatmap = read_from_file(filename)
     beatmap.sort_timing_points()
     duplicates = find_all_duplicates(beatmap)
 
     if len(duplicates) == 0:
         msg("No duplicates found.")
-        return
+        return duplicates
 
     unique_duplicate_times = set(x[0] for x in duplicates)
 
@@ -109,11 +165,7 @@ def check_duplicates(filename: str, should_print_results: bool, should_deduplica
         print_results(beatmap, duplicates, unique_duplicate_times, msg)
 
     if should_deduplicate:
-        # passes = 0
-        while len(duplicates) > 0:
-            deduplicate(duplicates)
-            duplicates = find_all_duplicates(beatmap)
-            # passes = 1
+        deduplicate_all(beatmap)
 
         base_bak_path = filename + '.bak'
         bak_path = base_bak_path
@@ -128,6 +180,8 @@ def check_duplicates(filename: str, should_print_results: bool, should_deduplica
         with open(filename, "w") as out:
             write_to_file(beatmap, out)
 
+    return duplicates
+
 
 if __name__ == '__main__':
     import tkinter as ui
@@ -1,26 +1,36 @@
 import os
+from bisect import bisect_left
+from collections import Counter
+from itertools import groupby
+from operator import attrgetter
 
 from osutk.osufile.beatmap import read_from_file, write_to_file, Hitsound
 from osutk.objects.hitobject import HitObject, HitCircle
+from osutk.objects.storyboard_sample_table import StoryboardSampleTable
 from shutil import copyfile
 
 from osutk.translate import to_osu_time_notation
 
 
-def accumulate_by_sound_set(sound_list: list[Hitsound], sounds_to_accumulate: int) -> int:
+def accumulate_by_sound_set(sounds: list[Hitsound], indices: list[int], sounds_to_accumulate: int) -> int:
     """
     Reduce the number of sounds used in a custom set by accumulating them into a single sound
-    @param sound_list: List of sounds to reduce.
+    @param sounds: List of all sounds. Hitsounds are immutable, so accumulated sounds are replaced in it.
+    @param indices: Indices in sounds of the sounds to reduce.
     @param sounds_to_accumulate: Number of sounds to accumulate
     @return: Count of sounds that could not be accumulated.
     """
-    sounds_by_custom_set = group_sounds_by_custom_set(sound_list)
+    indices_by_custom_set = group_sounds_by_custom_set(sounds, indices)
 
-    for custom_set, sound_list in sounds_by_custom_set.items():
+    for custom_set, index_list in indices_by_custom_set.items():
         # group hitsounds of this group.
-        while len(sound_list) > 1:
-            sound_list[0].hitsound |= sound_list[1].hitsound
-            sound_list.remove(sound_list[1])
+        while len(index_list) > 1:
+            first, second = index_list[0], index_list[1]
+            accumulated = sounds[second]
+            sounds[first] = sounds[first].replace(hitsound=sounds[first].hitsound | accumulated.hitsound)
+
+            # drop the first sound equal to the one we accumulated, like list.remove would.
+            del index_list[next(i for i, index in enumerate(index_list) if sounds[index] == accumulated)]
             sounds_to_accumulate -= 1
 
             if sounds_to_accumulate <= 0:
@@ -32,24 +42,61 @@ def accumulate_by_sound_set(sound_list: list[Hitsound], sounds_to_accumulate: in
     return sounds_to_accumulate
 
 
-def group_sounds_by_custom_set(sound_list: list[Hitsound]) -> dict[int, list[Hitsound]]:
-    sounds_by_group_index = {}
-    for sound in sound_list:
-        if sound.custom_set not in sounds_by_group_index:
-            sounds_by_group_index[sound.custom_set] = []
+def group_sounds_by_custom_set(sounds: list[Hitsound], indices: list[int]) -> dict[int, list[int]]:
+    indices_by_group_index = {}
+    for index in indices:
+        custom_set = sounds[index].custom_set
+        if custom_set not in indices_by_group_index:
+            indices_by_group_index[custom_set] = []
+
+        indices_by_group_index[custom_set].append(index)
+    return indices_by_group_index
+
+
+def group_sounds_by_sample_set(sounds: list[Hitsound]) -> dict[int, list[int]]:
+    indices_by_soundset = {}
+    for index, snd in enumerate(sounds):
+        if snd.sample_set not in indices_by_soundset:
+            indices_by_soundset[snd.sample_set] = []
 
-        sounds_by_group_index[sound.custom_set].append(sound)
-    return sounds_by_group_index
+        indices_by_soundset[snd.sample_set].append(index)
+    return indices_by_soundset
 
 
-def group_sounds_by_sample_set(sounds: list[Hitsound]) -> dict[int, list[Hitsound]]:
-    sounds_by_soundset = {}
-    for snd in sounds:
-        if snd.sample_set not in sounds_by_soundset:
-            sounds_by_soundset[snd.sample_set] = []
+class ObjectsByPosition(object):
+    """
+    The objects still free to take a sound at some time, kept sorted by x for nearest lookups.
+    Objects at the same x keep the order they were given in.
+    """
+
+    def __init__(self, hitobjects):
+        ordered = sorted(hitobjects, key=attrgetter("x"))
+        self.positions = [obj.x for obj in ordered]
+        self.objects = ordered
 
-        sounds_by_soundset[snd.sample_set].append(snd)
-    return sounds_by_soundset
+    def __len__(self):
+        return len(self.objects)
+
+    def nearest(self, x: float) -> int:
+        """
+        @return: Index of the object closest to x. On a tie, the one to the left,
+         or the first one given among objects at the same x.
+        """
+        index = bisect_left(self.positions, x)
+        if index > 0 and (index == len(self.positions) or x - self.positions[index - 1] <= self.positions[index] - x):
+            # Several objects may share that position: take the first of them.
+            return bisect_left(self.positions, self.positions[index - 1], 0, index - 1)
+        return index
+
+    def leftmost_empty(self) -> int:
+        """
+        @return: Index of the leftmost object without hitsounds, or of the leftmost object if none are empty.
+        """
+        return next((i for i, obj in enumerate(self.objects) if obj.hitsound == 0), 0)
+
+    def pop(self, index: int) -> HitObject:
+        del self.positions[index]
+        return self.objects.pop(index)
 
 
 def assign_sounds_to_closest_objects_with_same_sound(
@@ -58,26 +105,84 @@ def assign_sounds_to_closest_objects_with_same_sound(
         snd_len: int,
         sounds: list[Hitsound]):
     snd_map = []
-    used_sounds = set()
+    candidates = ObjectsByPosition(hitobjects)
     for sound in sounds[:snd_len]:
 
         # we have assigned this sound to an object previously?
-        unused_objects = hitobjects - used_sounds
         if sound in last_sounds:
             # find closest object
-            obj = min(unused_objects, key=lambda o: abs(o.x - last_sounds[sound]))
+            obj = candidates.pop(candidates.nearest(last_sounds[sound]))
         else:
-            # leftmost object that's empty, any if none are empty
-            obj = min(unused_objects, key=lambda o: 1024 if o.hitsound != 0 else o.x)
+            # leftmost object that's empty, the leftmost one if none are empty
+            obj = candidates.pop(candidates.leftmost_empty())
 
         # copy the position to keep track of what would be the closest to this later.
         last_sounds[sound] = obj.x
-        used_sounds.add(obj)
 
         # map our sound to this object.
         snd_map.append((sound, obj))
 
-    return snd_map, list(set(sounds).difference(used_sounds))
+    return snd_map, sounds[snd_len:]
+
+
+def match_positions(targets: list[float], positions: list[float]) -> list[int]:
+    """
+    Match every target to a different position so the total distance is the smallest possible.
+    @param targets: Sorted positions to match.
+    @param positions: Sorted positions to match them to. There must be at least as many as targets.
+    @return: For every target, the index of its position. In one dimension an optimal matching never crosses,
+     so it's found by dynamic programming over both sorted lists rather than with a general assignment solver.
+    """
+    n, m = len(targets), len(positions)
+    # cost[i][j]: the smallest total distance matching the first i targets among the first j positions.
+    cost = [[0.0] * (m + 1)] + [[float("inf")] * (m + 1) for _ in range(n)]
+    for i in range(1, n + 1):
+        row, previous = cost[i], cost[i - 1]
+        target = targets[i - 1]
+        for j in range(i, m + 1):
+            row[j] = min(row[j - 1], previous[j - 1] + abs(target - positions[j - 1]))
+
+    matches = [0] * n
+    j = m
+    for i in range(n, 0, -1):
+        while cost[i][j] == cost[i][j - 1]:
+            j -= 1
+        matches[i - 1] = j - 1
+        j -= 1
+    return matches
+
+
+def assign_sounds_to_objects_optimally(
+        hitobjects: set[HitObject],
+        last_sounds: dict[Hitsound, float],
+        snd_len: int,
+        sounds: list[Hitsound]):
+    """
+    Like assign_sounds_to_closest_objects_with_same_sound, but the sounds used before are placed all at once,
+    so the total movement from their previous positions is minimal instead of each sound greedily taking the
+    closest object left. New sounds then take the leftmost objects left, empty ones first.
+    """
+    candidates = ObjectsByPosition(hitobjects)
+    known = sorted((i for i, sound in enumerate(sounds[:snd_len]) if sound in last_sounds),
+                   key=lambda i: last_sounds[sounds[i]])
+    matches = match_positions([last_sounds[sounds[i]] for i in known], candidates.positions)
+
+    assigned = {}
+    for sound_index, position_index in zip(known, matches):
+        assigned[sound_index] = candidates.objects[position_index]
+    for position_index in reversed(matches):
+        candidates.pop(position_index)
+
+    snd_map = []
+    for i, sound in enumerate(sounds[:snd_len]):
+        obj = assigned.get(i)
+        if obj is None:
+            obj = candidates.pop(candidates.leftmost_empty())
+
+        last_sounds[sound] = obj.x
+        snd_map.append((sound, obj))
+
+    return snd_map, sounds[snd_len:]
 
 
 def accumulate_hitsounds(t: float, hitobjects: set[HitObject], sounds: list[Hitsound], msgfn):
@@ -85,8 +190,8 @@ def accumulate_hitsounds(t: float, hitobjects: set[HitObject], sounds: list[Hits
         sounds_by_soundset = group_sounds_by_sample_set(sounds)
 
         sounds_to_accumulate = len(sounds) - len(hitobjects)
-        for sound_set, sound_list in sounds_by_soundset.items():
-            sounds_to_accumulate = accumulate_by_sound_set(sound_list, sounds_to_accumulate)
+        for sound_set, indices in sounds_by_soundset.items():
+            sounds_to_accumulate = accumulate_by_sound_set(sounds, indices, sounds_to_accumulate)
             if sounds_to_accumulate == 0:
                 break
 
@@ -100,11 +205,18 @@ def copy_sounds(
         last_sounds: dict[Hitsound, float],
         copy_to_closest: bool,
         hitobjects_dst: set[HitObject],
-        sounds: list[Hitsound]):
+        sounds: list[Hitsound],
+        optimal_closest: bool = False):
     # map sounds to objects
     # snd_map is a list where each element of the tuple is what sound to apply to what object
     snd_len = min(len(sounds), len(hitobjects_dst))
-    if copy_to_closest:
+    if copy_to_closest and optimal_closest:
+        snd_map, reminder = assign_sounds_to_objects_optimally(
+            hitobjects_dst,
+            last_sounds,
+            snd_len,
+            sounds)
+    elif copy_to_closest:
         snd_map, reminder = assign_sounds_to_closest_objects_with_same_sound(
             hitobjects_dst,
             last_sounds,
@@ -130,13 +242,75 @@ def copy_sounds(
     return reminder
 
 
+def merge_by_time(moments, *streams):
+    """
+    Walk time-sorted streams in step with a sorted list of moments, in a single pass over each of them.
+    @param moments: Sorted, distinct times.
+    @param streams: (iterable, key) pairs. Every iterable must be sorted by key, which gives the time of an item.
+    @return: An iterator of (moment, groups), with groups holding for every stream the list of its items
+     at exactly that moment. Items at other times are skipped.
+    """
+    iterators = [groupby(iterable, key=key) for iterable, key in streams]
+    heads = [next(it, None) for it in iterators]
+    for t in moments:
+        groups = []
+        for i, it in enumerate(iterators):
+            head = heads[i]
+            while head is not None and head[0] < t:
+                head = next(it, None)
+
+            if head is not None and head[0] == t:
+                groups.append(list(head[1]))
+                head = next(it, None)
+            else:
+                groups.append([])
+            heads[i] = head
+
+        yield t, groups
+
+
+def sound_difference(sounds_src: list[Hitsound], sounds_dst: list[tuple]) -> tuple[list, list]:
+    """
+    Take out of the source sounds the ones the destination already has, as a multiset difference.
+    @param sounds_src: Sounds to copy.
+    @param sounds_dst: (sound, object) pairs already in the destination.
+    @return: The (sound, object) pairs of the destination that were found in the source, in destination order,
+     and the source sounds that remain, in source order. For a repeated sound, the first occurrences are the ones
+     taken out.
+    """
+    if not sounds_src or not sounds_dst:
+        return [], list(sounds_src)
+
+    available = Counter(sounds_src)
+    taken = Counter()
+    pre_existing = []
+    for snd, obj in sounds_dst:
+        if available[snd] > 0:
+            available[snd] -= 1
+            taken[snd] += 1
+            pre_existing.append((snd, obj))
+
+    if not pre_existing:
+        return pre_existing, list(sounds_src)
+
+    difference = []
+    for snd in sounds_src:
+        if taken[snd] > 0:
+            taken[snd] -= 1
+        else:
+            difference.append(snd)
+
+    return pre_existing, difference
+
+
 def do_hitsound_copy(filename_src,
                      filename_dst,
                      msgfn,
                      strictly_additive=False,
                      copy_to_closest=False,
                      copy_nonauto_hitnormals=True,
-                     allow_multiple_additions=False):
+                     allow_multiple_additions=False,
+                     optimal_closest=False):
     msgfn("Reading beatmap at {}...".format(filename_src))
     beatmap_src = read_from_file(filename_src)
     beatmap_dst = read_from_file(filename_dst)
@@ -145,25 +319,31 @@ def do_hitsound_copy(filename_src,
     moments = list(sorted(beatmap_src.get_distinct_times()))
 
     # remove volume information but copy the storyboard sounds otherwise
-    sb_sounds_out = set(x[:3] for x in beatmap_dst.sb_samples)
+    sb_sounds_out = StoryboardSampleTable(dict.fromkeys(x[:3] for x in beatmap_dst.sb_samples))
 
     if not strictly_additive:
         # We will completely replace sounds if this is true.
-        sb_sounds_out = set()
+        sb_sounds_out = StoryboardSampleTable()
         for obj in beatmap_dst.objects:
             obj.reset_hitsound()
 
+    # The objects of both maps are walked together once, in time order.
+    # Storyboard samples are looked up by time in their tables.
+    merged = merge_by_time(moments,
+                           (beatmap_src.resolve_all_sounds(), attrgetter("time")),
+                           (beatmap_dst.resolve_all_sounds(), attrgetter("time")))
+
     # This is similar to the process of make_hitsound_diff
     last_sounds = {}  # map sound to lane
-    for t in moments:
-        objs_src = beatmap_src.get_objects_at_time(t)
-        sb_sounds_src = [x for x in beatmap_src.sb_samples if x[0] == t]
+    for t, (resolved_at_src, resolved_at_dst) in merged:
+        sb_sounds_src = beatmap_src.sb_samples.at(t)
+        sb_sounds_dst = sb_sounds_out.at(t)
 
         # get all the distinct sounds at this time
         # remove the sounds that are completely deduced,
         # leaving only sounds that were actually set
-        time_sounds_src = list(snd for obj in objs_src
-                               for snd in beatmap_src.get_effective_sounds(obj)
+        time_sounds_src = list(snd for resolved in resolved_at_src
+                               for snd in resolved.sounds()
                                if not snd.is_auto)
 
         # account for storyboard samples
@@ -174,35 +354,24 @@ def do_hitsound_copy(filename_src,
             time_sounds_src = list(snd for snd in time_sounds_src
                                    if snd.hitsound != HitObject.SND_NORMAL)
 
-        # get objects of the destination at the current timestamp
-        objs_dst = beatmap_dst.get_objects_at_time(t)
-        sb_sounds_dst = [x for x in sb_sounds_out if x[0] == t]
-
         # if it's empty, don't bother
-        if len(objs_dst) == 0:
+        if len(resolved_at_dst) == 0:
             if len(time_sounds_src) > 0:
                 # informative, but a little spammy. just in case it's useful.
                 msgfn("{} - no objects to put {} sounds.".format(to_osu_time_notation(t), len(time_sounds_src)))
             continue
 
-        # get the list of all sounds for the objects of the destination at this time.
-        time_sounds_dst = list(snd for obj in objs_dst for snd in beatmap_dst.get_effective_sounds(obj))
+        # get the list of all sounds for the objects of the destination at this time, with the object they're on.
+        time_sounds_dst = list((snd, resolved.obj) for resolved in resolved_at_dst for snd in resolved.sounds())
 
         # add list of storyboard samples in the destination
-        time_sounds_dst.extend(Hitsound(custom_sample=x[2]) for x in sb_sounds_dst)
+        time_sounds_dst.extend((Hitsound(custom_sample=x[2]), None) for x in sb_sounds_dst)
 
         # take out all sounds from the source that already exist in the destination
-        time_sounds_pre_existing = []
-        time_sounds_difference = time_sounds_src[:]
-        for snd in time_sounds_dst:
-            if snd in time_sounds_difference:
-                time_sounds_pre_existing.append(snd)
-                time_sounds_difference.remove(snd)
+        time_sounds_pre_existing, time_sounds_difference = sound_difference(time_sounds_src, time_sounds_dst)
 
         # get hitobjects we can add hitsounds to, because they're empty
-        empty_sound_objs = set(obj for obj in objs_dst
-                               for snd in beatmap_dst.get_effective_sounds(obj)
-                               if snd.is_auto)
+        empty_sound_objs = set(resolved.obj for resolved in resolved_at_dst if resolved.is_auto)
 
         # accumulate sounds if we're short a few empty objects and they can be accumulated
         if allow_multiple_additions:
@@ -213,19 +382,22 @@ def do_hitsound_copy(filename_src,
             time_sounds_difference = custom_sounds + accumulatable_sounds
 
         # perform the copy at this time
-        reminder = copy_sounds(last_sounds, copy_to_closest, empty_sound_objs, time_sounds_difference)
+        reminder = copy_sounds(last_sounds, copy_to_closest, empty_sound_objs, time_sounds_difference,
+                               optimal_closest)
 
         # add remaining custom sample sounds to storyboard
         for snd in reminder:
             if snd.is_custom_sample:
                 # there's not a sound at this time with the same sample? add it then
-                sb_sounds_out.add((int(t), 0, snd.custom_sample))
+                sample = (int(t), 0, snd.custom_sample)
+                if sample not in sb_sounds_out:
+                    sb_sounds_out.add(sample)
 
         # at this time we have not accounted for sounds that already exist
         # so add those. to the last time we've used these sounds.
-        for snd in time_sounds_pre_existing:
-            if snd.obj is not None:
-                last_sounds[snd] = snd.obj.x
+        for snd, obj in time_sounds_pre_existing:
+            if obj is not None:
+                last_sounds[snd] = obj.x
 
     beatmap_dst.sb_samples = sb_sounds_out
 
@@ -347,6 +519,11 @@ def open_gui():
                                                 variable=copy_nonauto_hitnormals)
     copy_nonauto_hitnormals_cb.grid(column=1, row=1, sticky="W", padx=5)
 
+    optimal_closest = ui.BooleanVar()
+    optimal_closest_cb = ui.Checkbutton(options_pane, text="Minimize total note movement when copying to closest",
+                                        variable=optimal_closest)
+    optimal_closest_cb.grid(column=1, row=2, sticky="W", padx=5)
+
     # messages pane
     messages_frame = ui.LabelFrame(right_pane, text="Messages")
     messages_frame.pack(expand=1, fill=ui.BOTH)
@@ -391,7 +568,8 @@ def open_gui():
                          strictly_additive=replace_dst_hs.get(),
                          copy_to_closest=copy_to_closest.get(),
                          copy_nonauto_hitnormals=copy_nonauto_hitnormals.get(),
-                         allow_multiple_additions=allow_multiple_adds.get())
+                         allow_multiple_additions=allow_multiple_adds.get(),
+                         optimal_closest=optimal_closest.get())
 
     execute_button = ui.Button(actions_pane, text="run copy", command=run_copy)
     execute_button.pack(expand=0, fill=ui.NONE, side=ui.RIGHT, anchor=ui.S)
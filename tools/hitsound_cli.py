@@ -0,0 +1,210 @@
+"""
+Command line entry point for the hitsound tools, without any GUI.
+
+    python hitsound_cli.py duplicates "Songs/**/*.osu" --json
+    python hitsound_cli.py duplicates maps/ --fix --workers 4
+    python hitsound_cli.py copy source.osu "Songs/set/*.osu" --closest
+    python hitsound_cli.py diff "Songs/set/*.osu" --name "HS"
+
+Every map is processed independently, across a pool of worker processes when --workers is more than 1.
+A report is printed per file with how long it took. With --json, the reports are printed as a single JSON document.
+The exit status is 1 if any file failed, or with --fail-on-duplicates if any duplicates were found.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+import check_duplicate_hitsounds
+import copy_hitsounds
+import make_hitsound_diff
+
+
+def expand_patterns(patterns: list[str]) -> list[str]:
+    """
+    Turn paths, directories and glob patterns into a sorted list of .osu files, without repeats.
+    Directories are searched recursively.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.osu")
+
+        matches = glob.glob(pattern, recursive=True)
+        if not matches and os.path.isfile(pattern):
+            matches = [pattern]
+        paths.update(x for x in matches if os.path.isfile(x))
+    return sorted(paths)
+
+
+def run_duplicates(path: str, options: dict, msg) -> dict:
+    duplicates = check_duplicate_hitsounds.check_duplicates(path, options["verbose"], options["fix"], msg)
+    return {
+        "duplicates": [{"time": time, "lanes": [l1, l2], "sounds": sounds}
+                       for time, l1, l2, sounds, o1, o2 in duplicates],
+        "unique_times": len(set(x[0] for x in duplicates)),
+        "fixed": options["fix"] and len(duplicates) > 0,
+    }
+
+
+def run_copy(path: str, options: dict, msg) -> dict:
+    copy_hitsounds.do_hitsound_copy(options["source"], path, msg,
+                                    strictly_additive=options["additive"],
+                                    copy_to_closest=options["closest"],
+                                    copy_nonauto_hitnormals=not options["no_hitnormals"],
+                                    allow_multiple_additions=options["multiple_additions"],
+                                    optimal_closest=options["optimal"])
+    return {"source": options["source"]}
+
+
+def run_diff(path: str, options: dict, msg) -> dict:
+    return {"output": make_hitsound_diff.generate(path, options["name"], msg)}
+
+
+COMMANDS = {
+    "duplicates": run_duplicates,
+    "copy": run_copy,
+    "diff": run_diff,
+}
+
+
+def run_one(task: tuple) -> dict:
+    """
+    Run a command on one file, capturing its messages and timing it. Never raises.
+    """
+    command, path, options = task
+    messages = []
+    start = time.perf_counter()
+    report = {"path": path, "command": command, "ok": True, "error": None}
+    try:
+        report.update(COMMANDS[command](path, options, messages.append))
+    except Exception as e:
+        report["ok"] = False
+        report["error"] = "{}: {}".format(type(e).__name__, e)
+        if options["verbose"]:
+            messages.append(traceback.format_exc())
+
+    report["seconds"] = round(time.perf_counter() - start, 4)
+    report["messages"] = messages
+    return report
+
+
+def run_all(command: str, paths: list[str], options: dict, workers: int):
+    """
+    Run a command over many files.
+    @return: An iterator of reports, in the order of paths.
+    """
+    tasks = [(command, path, options) for path in paths]
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        yield from map(run_one, tasks)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap(run_one, tasks)
+
+
+def format_report(report: dict) -> str:
+    if not report["ok"]:
+        summary = "failed: {}".format(report["error"])
+    elif report["command"] == "duplicates":
+        summary = "{} duplicates at {} unique times".format(len(report["duplicates"]), report["unique_times"])
+        if report["fixed"]:
+            summary += ", fixed"
+    elif report["command"] == "diff":
+        summary = "wrote {}".format(report["output"])
+    else:
+        summary = "copied from {}".format(report["source"])
+
+    return "{}: {} ({:.2f}s)".format(report["path"], summary, report["seconds"])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run the hitsound tools over many beatmaps.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--workers", "-j", type=int, default=1,
+                        help="number of worker processes (default: 1, 0 for one per CPU)")
+    common.add_argument("--json", action="store_true", help="print a JSON report instead of text")
+    common.add_argument("--verbose", "-v", action="store_true", help="include the messages of every tool")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    duplicates = commands.add_parser("duplicates", parents=[common], help="find duplicate hitsounds")
+    duplicates.add_argument("maps", nargs="+", help=".osu files, directories or glob patterns")
+    duplicates.add_argument("--fix", action="store_true", help="remove the duplicates, backing up every file")
+    duplicates.add_argument("--fail-on-duplicates", action="store_true",
+                            help="exit with status 1 if any map has duplicates")
+
+    copy = commands.add_parser("copy", parents=[common], help="copy hitsounds from a map to others")
+    copy.add_argument("source", help="map to copy hitsounds from")
+    copy.add_argument("maps", nargs="+", help="maps to copy hitsounds to: files, directories or glob patterns")
+    copy.add_argument("--additive", action="store_true", help="keep the hitsounds already in the destination")
+    copy.add_argument("--closest", action="store_true", help="copy sounds to the closest object with the same sound")
+    copy.add_argument("--optimal", action="store_true",
+                      help="with --closest, place sounds so the total movement between lanes is minimal")
+    copy.add_argument("--no-hitnormals", action="store_true", help="don't copy non-automatic hitnormals")
+    copy.add_argument("--multiple-additions", action="store_true",
+                      help="accumulate additions onto one object when there are more sounds than objects")
+
+    diff = commands.add_parser("diff", parents=[common], help="generate hitsound difficulties")
+    diff.add_argument("maps", nargs="+", help=".osu files, directories or glob patterns")
+    diff.add_argument("--name", default="Hitsounds", help="difficulty name of the generated maps")
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    paths = expand_patterns(args.maps)
+    if args.command == "copy":
+        # never write into the map we're copying from.
+        source = os.path.abspath(args.source)
+        paths = [x for x in paths if os.path.abspath(x) != source]
+
+    options = vars(args).copy()
+    options.setdefault("fix", False)
+    workers = args.workers if args.workers > 0 else multiprocessing.cpu_count()
+
+    start = time.perf_counter()
+    reports = []
+    for report in run_all(args.command, paths, options, workers):
+        reports.append(report)
+        if not args.json:
+            print(format_report(report))
+            if args.verbose:
+                for message in report["messages"]:
+                    print("    " + message)
+
+    failed = sum(1 for x in reports if not x["ok"])
+    with_duplicates = sum(1 for x in reports if x["ok"] and x.get("duplicates"))
+    summary = {
+        "files": len(reports),
+        "failed": failed,
+        "seconds": round(time.perf_counter() - start, 4),
+        "file_seconds": round(sum(x["seconds"] for x in reports), 4),
+        "workers": workers,
+    }
+    if args.command == "duplicates":
+        summary["files_with_duplicates"] = with_duplicates
+
+    if args.json:
+        if not args.verbose:
+            for report in reports:
+                del report["messages"]
+        json.dump({"summary": summary, "files": reports}, sys.stdout, indent=2)
+        print()
+    else:
+        print("{files} files, {failed} failed, {seconds:.2f}s ({file_seconds:.2f}s of work, {workers} workers)"
+              .format(**summary))
+
+    if failed or (args.command == "duplicates" and args.fail_on_duplicates and with_duplicates):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,47 +1,48 @@
 import os.path
+from collections import Counter
+from itertools import groupby
+from operator import attrgetter
 
 from osutk.osufile.beatmap import read_from_file, write_to_file, Hitsound
 from osutk.objects.hitobject import HitObject, HitCircle
 import sys
 
 
-def generate(in_filename: str, diffname: str, msgfn):
+def generate(in_filename: str, diffname: str, msgfn) -> str:
+    """
+    @return: The path of the generated difficulty.
+    """
     msgfn("Reading beatmap from '{}'...".format(in_filename))
     beatmap = read_from_file(in_filename)
     moments = beatmap.get_distinct_times()
 
     msgfn("Analyzing...")
-    distinct_sound_combinations = set()
+    # how many timestamps every sound is used at, in order of first use.
+    sound_counts = Counter()
     sounds_at_time = {}
-    for t in moments:
-        objs = beatmap.get_objects_at_time(t)
+    for t, resolved_sounds in groupby(beatmap.resolve_all_sounds(), key=attrgetter("time")):
+        # get all of the distinct sounds at this time, in a stable order
+        time_sounds = dict.fromkeys(snd for resolved in resolved_sounds for snd in resolved.sounds())
 
-        # get all of the distinct sounds at this time
-        time_sounds = set(snd for obj in objs for snd in beatmap.get_effective_sounds(obj))
-
-        sb_obj_t = [x for x in beatmap.sb_samples if int(x[0]) == int(t)]
-
-        for x in sb_obj_t:
-            time_sounds.add(Hitsound(custom_sample=x[2]))
+        for x in beatmap.sb_samples.between(int(t), int(t) + 1):
+            time_sounds[Hitsound(custom_sample=x[2])] = None
 
         # remove the sounds that are completely deduced,
         # leaving only sounds that were actually set
-        time_sounds = set(snd for snd in time_sounds if not snd.is_auto)
+        time_sounds = [snd for snd in time_sounds if not snd.is_auto]
 
-        # add the distinct sounds to our list of
-        # distinct sounds in the totality of the map
-        for x in time_sounds:
-            distinct_sound_combinations.add(x)
+        # count the distinct sounds in the totality of the map
+        sound_counts.update(time_sounds)
 
         # add to our dictionary of sounds at different times
         sounds_at_time[t] = time_sounds
 
     msgfn(
         "{} unique sounds found over {} different timestamps."
-        .format(len(distinct_sound_combinations), len(moments))
+        .format(len(sound_counts), len(moments))
     )
 
-    lanes = len(distinct_sound_combinations)
+    lanes = len(sound_counts)
     if lanes > 18 or lanes == 0:
         msgfn(
             "{} is an unreasonable number of lanes. I'll do my best."
@@ -50,31 +51,27 @@ def generate(in_filename: str, diffname: str, msgfn):
 
     beatmap.lane_count = min(lanes, 18)
 
-    # map tuples to lanes
-    lane_map = {}
-    lane_index = 0
-    for item in distinct_sound_combinations:
-        lane_map[item] = lane_index
-        lane_index += 1
+    # map sounds to lanes, the most used ones first.
+    # most_common keeps the order of first use between sounds used as often, so the lanes are the same every run.
+    lane_map = {sound: lane for lane, (sound, count) in enumerate(sound_counts.most_common())}
 
     msgfn("Generating hitobjects...")
     new_objects = []
     sb_obj = []
-    for t in sounds_at_time.keys():
-        sounds_list = sounds_at_time[t]
+    for t, sounds_list in sounds_at_time.items():
         for sound in sounds_list:
             obj = None
             lane = lane_map[sound]
 
             if sound.is_custom_sample:
-                if lane > 18:
+                if lane >= beatmap.lane_count:
                     sb_obj.append((int(t), 0, sound.custom_sample))
                 else:
                     obj = HitCircle(beatmap.get_mania_lane_x(lane), 240, t, 0)
                     obj.custom_sample = sound.custom_sample
 
             else:
-                if lane > 18:
+                if lane >= beatmap.lane_count:
                     continue  # TODO: maybe make it so if it's a custom set, we translate that to a custom sample?
 
                 obj = HitCircle(beatmap.get_mania_lane_x(lane), 240, t, sound.hitsound)
@@ -105,6 +102,8 @@ def generate(in_filename: str, diffname: str, msgfn):
     with open(out_path, "w") as output:
         write_to_file(beatmap, output)
 
+    return out_path
+
 
 if __name__ == '__main__':
     import tkinter as ui